@@ -0,0 +1,79 @@
+"""Test de temps au pire cas de l'extraction d'une page club sur du HTML hostile
+
+Chaque cas génère une page malformée (nombres sans fin, libellés répétés,
+balises jamais fermées...) et vérifie que parse_club_stats et
+parse_member_table restent sous un budget de temps et que leur coût croît
+linéairement avec la taille de la page. Sort avec le code 1 si un budget
+est dépassé.
+
+Usage : python bench/bench_club_stats.py [--size 1000000] [--budget-ms 250]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import parse_club_stats, parse_member_table
+
+logging.disable(logging.WARNING)
+
+
+def repeat_to(chunk, size):
+    return chunk * (size // len(chunk) + 1)
+
+
+ADVERSARIAL_CASES = {
+    'chiffres sans fin': lambda size: '<h1>Club</h1>' + '1' * size,
+    'chiffres et slash': lambda size: '<h1>Club</h1>' + repeat_to('12 / ', size),
+    'libellés trophies sans nombre': lambda size: '<h1>Club</h1>' + repeat_to('total trophies <div>', size),
+    'libellés suivis de petits nombres': lambda size: '<h1>Club</h1>' + repeat_to('trophies 12 ', size),
+    'divs sans nombre': lambda size: repeat_to('<div class="stat">', size),
+    'h1 jamais fermés': lambda size: repeat_to('<h1 ', size),
+    'titre sans suffixe': lambda size: '<title>' + 'a ' * (size // 2),
+    'balises jamais fermées': lambda size: '<h1>Club</h1>' + repeat_to('<span trophies', size),
+    'membres répétés': lambda size: '<h1>Club</h1>' + repeat_to('members ', size),
+    'lignes jamais fermées': lambda size: repeat_to('<tr><td>', size),
+    'cellules sans fin': lambda size: '<tr>' + repeat_to('<td><font>', size) + '</tr>',
+    'ouvertures tr sans chevron': lambda size: repeat_to('<tr', size),
+}
+
+
+def parse_page(html):
+    parse_club_stats(html)
+    parse_member_table(html)
+
+
+def timed(html):
+    started = time.perf_counter()
+    parse_page(html)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1_000_000, help="taille des pages générées (caractères)")
+    parser.add_argument('--budget-ms', type=float, default=250.0, help="temps maximal autorisé par page")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'cas':<36} {'ms (taille/10)':>15} {'ms (taille)':>12} {'ratio':>7}")
+    for name, build in ADVERSARIAL_CASES.items():
+        small = timed(build(args.size // 10)) * 1000
+        large = timed(build(args.size)) * 1000
+        ratio = large / small if small else 0
+        # Un coût linéaire donne un ratio proche de 10 ; un coût quadratique, proche de 100
+        ok = large <= args.budget_ms and ratio < 30
+        failures += not ok
+        print(f"{name:<36} {small:>15.2f} {large:>12.2f} {ratio:>7.1f} {'' if ok else 'ÉCHEC'}")
+
+    if failures:
+        print(f"{failures} cas hors budget")
+        sys.exit(1)
+    print("Tous les cas respectent le budget")
+
+
+if __name__ == '__main__':
+    main()
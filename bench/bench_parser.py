@@ -0,0 +1,64 @@
+"""Micro-benchmark du parseur du tableau des membres (parse_member_table)
+
+Mesure le temps de parsing sur les pages enregistrées dans bench/fixtures,
+puis sur des pages agrandies artificiellement pour vérifier que le coût
+reste linéaire quand la page grossit.
+
+Usage : python bench/bench_parser.py [--repeat 200]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import parse_member_table
+
+logging.disable(logging.WARNING)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+TBODY_RE = re.compile(r'(<tbody>)(.*?)(</tbody>)', re.DOTALL)
+
+
+def load_fixtures():
+    """Charge les pages club enregistrées (nom -> HTML)"""
+    pages = {}
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if filename.endswith('.html'):
+            with open(os.path.join(FIXTURES_DIR, filename), encoding='utf-8') as f:
+                pages[filename] = f.read()
+    return pages
+
+
+def scale_page(html, factor):
+    """Duplique les lignes du tableau des membres pour simuler une page plus grande"""
+    return TBODY_RE.sub(lambda m: m.group(1) + m.group(2) * factor + m.group(3), html, count=1)
+
+
+def bench(html, repeat):
+    """Retourne (joueurs parsés, temps moyen en microsecondes)"""
+    players = parse_member_table(html)
+    seconds = min(timeit.repeat(lambda: parse_member_table(html), number=repeat, repeat=3)) / repeat
+    return len(players), seconds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help="nombre d'itérations par mesure")
+    args = parser.parse_args()
+
+    print(f"{'page':<40} {'taille':>10} {'joueurs':>8} {'µs/page':>10} {'µs/joueur':>10}")
+    for name, html in load_fixtures().items():
+        for factor in (1, 10, 100):
+            page = html if factor == 1 else scale_page(html, factor)
+            label = name if factor == 1 else f"{name} x{factor}"
+            players, micros = bench(page, max(1, args.repeat // factor))
+            per_player = micros / players if players else 0
+            print(f"{label:<40} {len(page):>10,} {players:>8} {micros:>10.1f} {per_player:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark hors ligne d'une mise à jour complète des clubs (refresh_clubs)
+
+Lance le faux serveur brawlace (bench/fake_brawlace.py) et branche le bot sur
+le Firestore en mémoire (bench/fake_firestore.py) ou sur le stockage SQLite,
+puis enchaîne trois cycles de mise à jour pour chaque nombre de clubs :
+  - froid : base vide, toutes les pages sont téléchargées et tous les joueurs créés ;
+  - inchangé : pages identiques (304 grâce à l'ETag) ;
+  - évolution : une fraction des joueurs a changé de trophées.
+Affiche pour chaque cycle le temps total, les requêtes HTTP, les documents lus
+et écrits, les RPC et commits Firestore (backend firestore seulement) et le pic
+mémoire (tracemalloc).
+
+Usage : python bench/bench_refresh.py [--clubs 6 60 600] [--players 30] [--concurrency 3] [--backend sqlite]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main import AdaptiveRateLimiter, AsyncSQLite, BrawlStarsBot
+from fake_brawlace import FakeBrawlace, synthetic_club_tags
+from fake_firestore import FakeFirestore
+
+logging.disable(logging.WARNING)
+
+
+def build_clubs(server, count):
+    """Clubs enregistrés d'abord, puis clubs synthétiques jusqu'à count (nom -> tag)"""
+    clubs = {}
+    for club_tag in list(server.recorded)[:count]:
+        clubs[f"Enregistré {club_tag}"] = club_tag
+    for index, club_tag in enumerate(synthetic_club_tags(count - len(clubs)), 1):
+        name = f"Synthétique {index}"
+        server.add_club(club_tag, name)
+        clubs[name] = club_tag
+    return clubs
+
+
+async def run_cycle(bot, server, db, trace_memory):
+    """Une mise à jour complète ; retourne les mesures du cycle"""
+    requests_before = (server.requests, server.not_modified, server.bytes_sent)
+    storage_before = dict(bot.store.counters)
+    firestore_before = db.snapshot() if db is not None else None
+    if trace_memory:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    results = await bot.refresh_clubs()
+    elapsed = time.perf_counter() - started
+
+    firestore_after = db.snapshot() if db is not None else None
+    return {
+        'ms': elapsed * 1000,
+        'ok': sum(1 for result in results.values() if result['status'] != 'error'),
+        'http': server.requests - requests_before[0],
+        '304': server.not_modified - requests_before[1],
+        'ko': (server.bytes_sent - requests_before[2]) / 1024,
+        **{name: bot.store.counters[name] - storage_before[name] for name in storage_before},
+        **{name: firestore_after[name] - firestore_before[name] if db is not None else float('nan') for name in ('rpcs', 'commits')},
+        'pic_mo': (tracemalloc.get_traced_memory()[1] - memory_before) / 2**20 if trace_memory else float('nan'),
+    }
+
+
+async def bench_size(club_count, args):
+    server = FakeBrawlace(players=args.players, churn=args.churn)
+    clubs = build_clubs(server, club_count)
+    base_url = await server.start()
+
+    if args.backend == 'sqlite':
+        db = None
+        bot = BrawlStarsBot(store=AsyncSQLite(':memory:'))
+    else:
+        db = FakeFirestore()
+        bot = BrawlStarsBot(db=db)
+    bot.clubs = clubs
+    bot.brawlace_base_url = base_url
+    bot.refresh_concurrency = args.concurrency
+    # Chaque cycle doit vraiment scraper : pas de réutilisation du rapport de moins d'une minute
+    bot.refresh_fresh_for = 0
+    bot.rate_limiter = AdaptiveRateLimiter(args.rate, burst=args.concurrency)
+    bot.http_session = await bot.create_session()
+
+    cycles = {}
+    try:
+        cycles['froid'] = await run_cycle(bot, server, db, args.tracemalloc)
+        cycles['inchangé'] = await run_cycle(bot, server, db, args.tracemalloc)
+        server.advance()
+        cycles['évolution'] = await run_cycle(bot, server, db, args.tracemalloc)
+    finally:
+        await bot.close_http_session()
+        bot.store.close()
+        await server.stop()
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clubs', type=int, nargs='+', default=[6, 60, 600], help="nombres de clubs à tester")
+    parser.add_argument('--players', type=int, default=30, help="joueurs par club synthétique")
+    parser.add_argument('--churn', type=float, default=0.2, help="fraction des joueurs qui changent entre deux heures")
+    parser.add_argument('--concurrency', type=int, default=3, help="clubs traités en parallèle (refresh_concurrency)")
+    parser.add_argument('--rate', type=float, default=float('inf'), help="débit maximal vers le faux serveur (requêtes/s)")
+    parser.add_argument('--backend', choices=('firestore', 'sqlite'), default='firestore',
+                        help="stockage : Firestore en mémoire ou SQLite en mémoire")
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                        help="désactive la mesure mémoire (temps plus fidèles)")
+    args = parser.parse_args()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    columns = ('ms', 'ok', 'http', '304', 'ko', 'rpcs', 'reads', 'writes', 'commits', 'pic_mo')
+    print(f"{'clubs':>6} {'cycle':<10} " + ' '.join(f"{column:>9}" for column in columns))
+    for club_count in args.clubs:
+        for cycle, measures in asyncio.run(bench_size(club_count, args)).items():
+            values = ' '.join(
+                f"{measures[column]:>9.1f}" if isinstance(measures[column], float) else f"{measures[column]:>9}"
+                for column in columns
+            )
+            print(f"{club_count:>6} {cycle:<10} {values}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Serveur HTTP local qui imite les pages club de brawlace
+
+Sert les pages enregistrées dans bench/fixtures sous leur tag, et des pages
+synthétiques (même gabarit, nombre de joueurs configurable) pour tous les
+autres clubs. Gère ETag / If-None-Match comme le vrai site et compte les
+requêtes et les octets envoyés. advance() fait évoluer les trophées d'une
+fraction des joueurs, pour simuler l'heure suivante.
+
+Usage autonome : python bench/fake_brawlace.py [--port 8085] [--players 30]
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+TEMPLATE_FIXTURE = 'club_prairie_fleurie.html'
+TAG_ALPHABET = '0289PYLQGRJCUV'
+
+TBODY_RE = re.compile(r'(<tbody>)(.*?)(</tbody>)', re.DOTALL)
+ROW_RE = re.compile(r'<tr class="align-middle">.*?</tr>', re.DOTALL)
+H1_RE = re.compile(r'(<h1[^>]*>)[^<]*(</h1>)')
+TITLE_RE = re.compile(r'<title>[^<]*</title>')
+TAG_DIV_RE = re.compile(r'(<div class="text-muted">)(#[0-9A-Z]+)(</div>)')
+TOTAL_RE = re.compile(r'(<span class="trophies">)[0-9,]+(</span>)')
+MEMBERS_RE = re.compile(r'[0-9]+/30 Members')
+ROW_TAG_RE = re.compile(r'(#|%23)[0-9A-Z]+')
+ROW_NAME_RE = re.compile(r'(<font color="#[0-9a-f]{6}">)[^<]*(</font></a>)')
+ROW_TROPHIES_RE = re.compile(r'(<font color="#ffc107">)[0-9,]+(</font>)')
+ROW_RANK_RE = re.compile(r'(<td class="text-center">)[0-9]+(</td>)')
+
+
+def load_fixtures():
+    """Charge les pages enregistrées, indexées par tag de club"""
+    pages = {}
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if filename.endswith('.html'):
+            with open(os.path.join(FIXTURES_DIR, filename), encoding='utf-8') as f:
+                html = f.read()
+            pages[TAG_DIV_RE.search(html).group(2)] = html
+    return pages
+
+
+def make_tag(*numbers):
+    """Tag Brawl Stars déterministe (alphabet officiel) à partir d'entiers"""
+    value = 1
+    for number in numbers:
+        value = value * 1_000_003 + number
+    digits = []
+    while value:
+        value, digit = divmod(value, len(TAG_ALPHABET))
+        digits.append(TAG_ALPHABET[digit])
+    return '#' + ''.join(digits).rjust(8, '2')
+
+
+def synthetic_club_tags(count):
+    """Tags des clubs synthétiques (déterministes)"""
+    return [make_tag(index) for index in range(count)]
+
+
+class SyntheticClub:
+    """Club généré : joueurs et trophées déterministes, modifiables par advance()"""
+
+    def __init__(self, template, club_tag, name, players, seed):
+        self.template = template
+        self.club_tag = club_tag
+        self.name = name
+        rng = random.Random(seed)
+        self.players = [
+            [make_tag(seed, index), f"Joueur {seed}-{index}", rng.randint(5_000, 100_000)]
+            for index in range(players)
+        ]
+        self.rng = rng
+
+    def advance(self, churn):
+        """Fait gagner ou perdre des trophées à une fraction des joueurs"""
+        for player in self.players:
+            if self.rng.random() < churn:
+                player[2] = max(0, player[2] + self.rng.randint(-40, 80))
+
+    def render(self):
+        row_template = ROW_RE.search(TBODY_RE.search(self.template).group(2)).group(0)
+        players = sorted(self.players, key=lambda player: player[2], reverse=True)
+        rows = []
+        for rank, (player_tag, pseudo, trophies) in enumerate(players, 1):
+            row = ROW_TAG_RE.sub(lambda m: m.group(1) + player_tag[1:], row_template)
+            row = ROW_NAME_RE.sub(lambda m: m.group(1) + pseudo + m.group(2), row)
+            row = ROW_TROPHIES_RE.sub(lambda m: m.group(1) + f"{trophies:,}" + m.group(2), row)
+            row = ROW_RANK_RE.sub(lambda m: m.group(1) + str(rank) + m.group(2), row, count=1)
+            rows.append(row)
+        html = TBODY_RE.sub(lambda m: m.group(1) + '\n        ' + '\n        '.join(rows) + '\n      ' + m.group(3), self.template, count=1)
+        html = H1_RE.sub(lambda m: m.group(1) + self.name + m.group(2), html, count=1)
+        html = TITLE_RE.sub(lambda _: f"<title>{self.name} - Brawl Ace</title>", html, count=1)
+        html = TAG_DIV_RE.sub(lambda m: m.group(1) + self.club_tag + m.group(3), html, count=1)
+        html = TOTAL_RE.sub(lambda m: m.group(1) + f"{sum(player[2] for player in players):,}" + m.group(2), html, count=1)
+        return MEMBERS_RE.sub(f"{len(players)}/30 Members", html, count=1)
+
+
+class FakeBrawlace:
+    """Application aiohttp servant /clubs/{tag} (pages enregistrées ou synthétiques)"""
+
+    def __init__(self, players=30, churn=0.2):
+        self.recorded = load_fixtures()
+        with open(os.path.join(FIXTURES_DIR, TEMPLATE_FIXTURE), encoding='utf-8') as f:
+            self.template = f.read()
+        self.players = players
+        self.churn = churn
+        self.synthetic = {}
+        self._pages = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.app = web.Application()
+        self.app.router.add_get('/clubs/{tag}', self.club_page)
+        self.runner = None
+
+    def add_club(self, club_tag, name=None):
+        """Déclare un club synthétique (les clubs enregistrés sont servis tels quels)"""
+        if club_tag not in self.recorded:
+            seed = len(self.synthetic) + 1
+            self.synthetic[club_tag] = SyntheticClub(self.template, club_tag, name or f"Club {seed}", self.players, seed)
+
+    def advance(self):
+        """Passe à « l'heure suivante » : une fraction des joueurs synthétiques change"""
+        for club in self.synthetic.values():
+            club.advance(self.churn)
+        self._pages.clear()
+
+    def page(self, club_tag):
+        """Retourne (html, etag) d'un club, ou None s'il est inconnu"""
+        if club_tag not in self._pages:
+            if club_tag in self.recorded:
+                html = self.recorded[club_tag]
+            elif club_tag in self.synthetic:
+                html = self.synthetic[club_tag].render()
+            else:
+                return None
+            etag = '"' + hashlib.sha1(html.encode('utf-8')).hexdigest() + '"'
+            self._pages[club_tag] = (html.encode('utf-8'), etag)
+        return self._pages[club_tag]
+
+    async def club_page(self, request):
+        self.requests += 1
+        page = self.page(request.match_info['tag'].upper())
+        if page is None:
+            return web.Response(status=404, text="Club not found")
+        body, etag = page
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='text/html', charset='utf-8', headers={'ETag': etag})
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Démarre le serveur et retourne son URL de base"""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--players', type=int, default=30, help="joueurs par club synthétique")
+    parser.add_argument('--clubs', type=int, default=10, help="nombre de clubs synthétiques")
+    args = parser.parse_args()
+
+    server = FakeBrawlace(players=args.players)
+    for club_tag in synthetic_club_tags(args.clubs):
+        server.add_club(club_tag)
+    print("Clubs servis :", ', '.join(list(server.recorded) + list(server.synthetic)))
+    web.run_app(server.app, host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Firestore en mémoire pour les benchmarks hors ligne
+
+Implémente le sous-ensemble du client Firestore utilisé par le bot
+(collection/document, get/set/update/delete, where/order_by/limit/stream,
+WriteBatch, get_all, ArrayUnion) et compte les allers-retours (RPC),
+les documents lus et les documents écrits, comme le ferait la facturation.
+Les données sont copiées à l'écriture et à la lecture, comme après un
+passage par le réseau.
+"""
+import copy
+import threading
+
+from firebase_admin import firestore
+
+BATCH_MAX_WRITES = 500
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+class FakeDocument:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.id = doc_id
+
+    @property
+    def _docs(self):
+        return self.db.data.setdefault(self.collection, {})
+
+    def _read(self, field_paths=None):
+        data = self._docs.get(self.id)
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return FakeSnapshot(self, copy.deepcopy(data))
+
+    def _write(self, data, merge=False, must_exist=False):
+        current = self._docs.get(self.id)
+        if must_exist and current is None:
+            raise KeyError(f"{self.collection}/{self.id} n'existe pas")
+        if current is None or not merge:
+            current = {}
+        for field, value in data.items():
+            if isinstance(value, firestore.ArrayUnion):
+                values = current.setdefault(field, [])
+                values.extend(copy.deepcopy(item) for item in value.values if item not in values)
+            elif value is firestore.DELETE_FIELD:
+                current.pop(field, None)
+            else:
+                current[field] = copy.deepcopy(value)
+        self._docs[self.id] = current
+
+    def get(self, field_paths=None):
+        self.db.record(rpcs=1, reads=1)
+        return self._read(field_paths)
+
+    def set(self, data, merge=False):
+        self.db.record(rpcs=1, writes=1)
+        self._write(data, merge=merge)
+
+    def update(self, data):
+        self.db.record(rpcs=1, writes=1)
+        self._write(data, merge=True, must_exist=True)
+
+    def delete(self):
+        self.db.record(rpcs=1, writes=1)
+        self._docs.pop(self.id, None)
+
+
+class FakeQuery:
+    OPERATORS = {
+        '==': lambda value, expected: value == expected,
+        'in': lambda value, expected: value in expected,
+        '>=': lambda value, expected: value >= expected,
+        '<=': lambda value, expected: value <= expected,
+    }
+
+    def __init__(self, db, collection, filters=(), order=None, limit_count=None):
+        self.db = db
+        self.collection = collection
+        self.filters = tuple(filters)
+        self.order = order
+        self.limit_count = limit_count
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.collection, self.filters + ((field, op, value),), self.order, self.limit_count)
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return FakeQuery(self.db, self.collection, self.filters, (field, direction), self.limit_count)
+
+    def limit(self, count):
+        return FakeQuery(self.db, self.collection, self.filters, self.order, count)
+
+    def stream(self):
+        rows = [
+            (doc_id, data) for doc_id, data in self.db.data.get(self.collection, {}).items()
+            if all(field in data and self.OPERATORS[op](data[field], value) for field, op, value in self.filters)
+        ]
+        if self.order:
+            field, direction = self.order
+            rows = [row for row in rows if field in row[1]]
+            rows.sort(key=lambda row: row[1][field], reverse=direction == firestore.Query.DESCENDING)
+        if self.limit_count is not None:
+            rows = rows[:self.limit_count]
+        # Une requête est facturée au moins une lecture, même sans résultat
+        self.db.record(rpcs=1, reads=max(1, len(rows)))
+        return iter([FakeSnapshot(FakeDocument(self.db, self.collection, doc_id), copy.deepcopy(data)) for doc_id, data in rows])
+
+    get = stream
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, collection):
+        super().__init__(db, collection)
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, self.collection, doc_id)
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self.db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, data, merge, False))
+
+    def update(self, reference, data):
+        self._writes.append((reference, data, True, True))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        if len(self._writes) > BATCH_MAX_WRITES:
+            raise ValueError(f"Un lot ne peut pas dépasser {BATCH_MAX_WRITES} écritures")
+        self.db.record(rpcs=1, writes=len(self._writes), commits=1)
+        for reference, data, merge, must_exist in self._writes:
+            reference._write(data, merge=merge, must_exist=must_exist)
+        self._writes = []
+
+
+class FakeFirestore:
+    """Client Firestore en mémoire avec compteurs (rpcs, reads, writes, commits)"""
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('rpcs', 'reads', 'writes', 'commits'), 0)
+
+    def record(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self.counters[name] += value
+
+    def snapshot(self):
+        """Copie des compteurs (pour calculer des écarts entre deux phases)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, references, field_paths=None):
+        references = list(references)
+        self.record(rpcs=1, reads=len(references))
+        return iter([reference._read(field_paths) for reference in references])
@@ -1,15 +1,27 @@
 import discord
 from discord.ext import commands, tasks
 import asyncio
+import contextlib
 import aiohttp
+from aiohttp import web
 import re
 import json
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta, time as dtime
 import logging
-from flask import Flask
-import threading
 import time
+import functools
+import hashlib
+import sqlite3
+import itertools
+import threading
+import math
+import random
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
 
 # Firebase imports
 import firebase_admin
@@ -19,15 +31,1133 @@ from firebase_admin import credentials, firestore
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class BrawlStarsBot:
+# Firestore limite un WriteBatch à 500 opérations : on garde une marge
+FIRESTORE_BATCH_LIMIT = 450
+
+# Champs d'un joueur comparés pour savoir s'il faut le réécrire
+PLAYER_STATE_FIELDS = ('pseudo', 'club', 'trophees_actuels', 'trophees_debut_mois', 'gain_mois')
+
+# Expressions précompilées pour le tableau des membres d'une page club brawlace.
+# Le contenu des lignes/cellules est lu par blocs [^<]* (boucle déroulée) plutôt
+# qu'avec un .*? paresseux, qui teste la balise fermante à chaque caractère.
+# Une ligne (resp. cellule) s'arrête aussi à l'ouverture de la suivante : une page mal
+# formée (balises jamais fermées) ne peut donc pas rendre le parsing quadratique.
+MEMBER_ROW_RE = re.compile(r'<tr[^<>]{0,500}>([^<]*(?:<(?!/tr>|tr[\s>])[^<]*)*)</tr>', re.IGNORECASE)
+MEMBER_CELL_RE = re.compile(r'<td[^<>]{0,500}>([^<]*(?:<(?!/td>|t[dr][\s>])[^<]*)*)</td>', re.IGNORECASE)
+PSEUDO_RES = (
+    re.compile(r'<font[^>]*>([^<]+)</font>'),
+    re.compile(r'<a[^>]*>([^<]+)</a>'),
+    re.compile(r'>([^<]+)<'),
+)
+PLAYER_ID_RES = (
+    re.compile(r'data-bs-player-tag=[\'"]([^\'"]*)[\'"]'),
+    re.compile(r'player-tag=[\'"]([^\'"]*)[\'"]'),
+    re.compile(r'href="[^"]*player/([^/"]*)"'),
+)
+TROPHY_RES = (
+    re.compile(r'<font[^>]*>([0-9,]+)</font>'),
+    re.compile(r'>([0-9,]+)<'),
+    re.compile(r'([0-9,]+)'),
+)
+
+# Extraction des statistiques du club (nom, trophées totaux, membres).
+# Toutes les répétitions sont bornées et la recherche est limitée au bloc d'en-tête
+# (du <h1> jusqu'au tableau des membres) : coût linéaire, sans retour arrière.
+STATS_BLOCK_MAX = 65536
+STATS_VALUE_WINDOW = 300
+CLUB_NAME_RES = (
+    re.compile(r'<h1[^<>]{0,200}>([^<]{1,200})</h1>', re.IGNORECASE),
+    re.compile(r'<title>([^<]{0,200}?)\s{0,10}-\s{0,10}Brawl Ace</title>', re.IGNORECASE),
+    re.compile(r'class="club-name[^"<>]{0,200}">([^<]{1,200})<', re.IGNORECASE),
+)
+H1_RE = re.compile(r'<h1[\s>]', re.IGNORECASE)
+TABLE_RE = re.compile(r'<table[\s>]', re.IGNORECASE)
+TROPHIES_LABEL_RE = re.compile(r'(required\s{0,5})?((?:total|club)\s{0,5})?trophies?', re.IGNORECASE)
+MEMBERS_RES = (
+    re.compile(r'(?<![0-9])([0-9]{1,3})\s{0,5}/\s{0,5}30\s{0,5}members?', re.IGNORECASE),
+    re.compile(r'members?\s{0,5}:?\s{0,5}([0-9]{1,3})(?![0-9])', re.IGNORECASE),
+)
+HTML_TAG_RE = re.compile(r'<[^<>]{0,500}>')
+NUMBER_RE = re.compile(r'[0-9][0-9,]{0,15}')
+
+def find_stats_block(html):
+    """Retourne le bloc d'en-tête d'une page club (statistiques), de taille bornée"""
+    h1_match = H1_RE.search(html)
+    start = h1_match.start() if h1_match else 0
+    table_match = TABLE_RE.search(html, start)
+    end = table_match.start() if table_match else len(html)
+    return html[start:min(end, start + STATS_BLOCK_MAX)]
+
+def parse_club_stats(html):
+    """Extrait nom, trophées totaux et nombre de membres (0 si introuvable) d'une page club"""
+    stats = {'name': '', 'total_trophies': 0, 'member_count': 0}
+    
+    for pattern in CLUB_NAME_RES:
+        match = pattern.search(html)
+        if match:
+            stats['name'] = match.group(1).strip()
+            break
+    
+    block = find_stats_block(html)
+    
+    # Trophées totaux : premier nombre qui suit un libellé "trophies" dans une fenêtre bornée.
+    # Les libellés "total/club trophies" sont prioritaires, "required trophies" est ignoré.
+    fallback_trophies = 0
+    for label in TROPHIES_LABEL_RE.finditer(block):
+        if label.group(1):
+            continue
+        window = HTML_TAG_RE.sub(' ', block[label.end():label.end() + STATS_VALUE_WINDOW])
+        number = NUMBER_RE.search(window)
+        if not number:
+            continue
+        trophies = int(number.group(0).replace(',', ''))
+        if trophies <= 1000:  # Les clubs ont généralement plus de 1000 trophées
+            continue
+        if label.group(2):
+            stats['total_trophies'] = trophies
+            break
+        if not fallback_trophies:
+            fallback_trophies = trophies
+    else:
+        stats['total_trophies'] = fallback_trophies
+    
+    for pattern in MEMBERS_RES:
+        match = pattern.search(block)
+        if match:
+            stats['member_count'] = int(match.group(1))
+            break
+    
+    return stats
+
+def club_page_fingerprint(html):
+    """Empreinte de la partie utile d'une page club (en-tête + tableau des membres)
+    
+    Permet de reconnaître une page identique à la précédente même quand le
+    serveur ne gère pas ETag / Last-Modified.
+    """
+    h1_match = H1_RE.search(html)
+    start = h1_match.start() if h1_match else 0
+    table_match = TABLE_RE.search(html, start)
+    end = len(html)
+    if table_match:
+        table_end = html.find('</table>', table_match.start())
+        if table_end != -1:
+            end = table_end
+    return hashlib.sha256(html[start:end].encode('utf-8')).hexdigest()
+
+def iter_member_rows(html):
+    """Parcourt le tableau des membres en une passe et produit (cellule joueur, cellule trophées)
+    
+    Seules les lignes d'au moins 4 cellules sont retenues, et seules les 4
+    premières cellules de chaque ligne sont découpées.
+    """
+    for row_match in MEMBER_ROW_RE.finditer(html):
+        cells = [cell.group(1) for cell in itertools.islice(MEMBER_CELL_RE.finditer(row_match.group(1)), 4)]
+        if len(cells) == 4:
+            yield cells[1], cells[3]
+
+def parse_member_row(player_cell, trophy_cell):
+    """Extrait (pseudo, id, trophées) d'une ligne du tableau des membres"""
+    pseudo = ""
+    for pattern in PSEUDO_RES:
+        match = pattern.search(player_cell)
+        if match and match.group(1).strip():
+            pseudo = match.group(1).strip()
+            break
+    
+    player_id = ""
+    for pattern in PLAYER_ID_RES:
+        match = pattern.search(player_cell)
+        if match:
+            player_id = match.group(1).strip()
+            if not player_id.startswith('#'):
+                player_id = '#' + player_id
+            break
+    
+    trophies = 0
+    for pattern in TROPHY_RES:
+        match = pattern.search(trophy_cell)
+        if match:
+            try:
+                trophies = int(match.group(1).strip().replace(',', '').replace(' ', ''))
+                break
+            except ValueError:
+                continue
+    
+    return pseudo, player_id, trophies
+
+def parse_member_table(html):
+    """Retourne la liste des joueurs valides (pseudo, id, trophies) d'une page club"""
+    players = []
+    for player_cell, trophy_cell in iter_member_rows(html):
+        pseudo, player_id, trophies = parse_member_row(player_cell, trophy_cell)
+        
+        if pseudo and player_id and trophies > 0:
+            players.append({
+                'pseudo': pseudo,
+                'id': player_id,
+                'trophies': trophies
+            })
+        else:
+            # Debug des cas où on ne trouve pas de données
+            if not pseudo:
+                logger.debug(f"Pseudo manquant dans: {player_cell[:100]}")
+            if not player_id:
+                logger.debug(f"ID manquant dans: {player_cell[:100]}")
+            if trophies <= 0:
+                logger.debug(f"Trophées invalides dans: {trophy_cell[:100]}")
+    return players
+
+# Heure (UTC) de la réinitialisation mensuelle automatique, le 1er du mois
+MONTHLY_RESET_TIME = dtime(0, 0, tzinfo=timezone.utc)
+
+# Bornes (secondes) des histogrammes de durée exposés sur /metrics
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Metrics:
+    """Registre minimal de compteurs et d'histogrammes au format texte Prometheus
+    
+    Utilisable depuis la boucle d'événements comme depuis le pool de threads Firestore.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}        # nom -> (type, aide, bornes)
+        self._counters = {}    # (nom, labels) -> valeur
+        self._histograms = {}  # (nom, labels) -> [compteurs par borne, somme, total]
+    
+    def counter(self, name, help_text):
+        """Déclare un compteur"""
+        self._meta[name] = ('counter', help_text, None)
+    
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Déclare un histogramme"""
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+    
+    def inc(self, name, value=1, **labels):
+        """Incrémente un compteur"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, **labels):
+        """Ajoute une observation à un histogramme"""
+        buckets = self._meta[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = [f'{name}="{value}"' for name, value in itertools.chain(labels, extra)]
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+    
+    def render(self):
+        """Exporte toutes les séries au format texte Prometheus"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(state[0]), state[1], state[2]) for key, state in self._histograms.items()}
+        
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (series, labels), value in counters.items():
+                    if series == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+                continue
+            for (series, labels), (counts, total, count) in histograms.items():
+                if series != name:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {bucket_count}")
+                lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.histogram('brawlace_fetch_seconds', "Durée des requêtes HTTP vers brawlace")
+metrics.counter('brawlace_requests_total', "Requêtes HTTP vers brawlace par statut")
+metrics.counter('brawlace_response_bytes_total', "Octets de HTML reçus de brawlace")
+metrics.counter('brawlace_retries_total', "Nouvelles tentatives vers brawlace par motif")
+metrics.counter('brawlace_circuit_rejections_total', "Requêtes vers brawlace refusées par le disjoncteur")
+metrics.histogram('club_scrape_seconds', "Durée du scraping d'une page club (téléchargement et parsing)")
+metrics.histogram('club_parse_seconds', "Durée du parsing d'une page club")
+metrics.counter('club_players_parsed_total', "Joueurs extraits des pages club")
+metrics.histogram('club_refresh_seconds', "Durée de la mise à jour complète d'un club par statut")
+metrics.counter('club_refresh_coalesced_total', "Mises à jour de club évitées (rattachées à une mise à jour en cours ou récente)")
+metrics.histogram('storage_op_seconds', "Durée des appels au stockage par backend et opération")
+metrics.counter('storage_reads_total', "Documents lus par backend et opération")
+metrics.counter('storage_writes_total', "Documents écrits par backend et opération")
+metrics.histogram('discord_command_seconds', "Latence des commandes slash (création de l'interaction à la fin du traitement)")
+metrics.counter('discord_commands_total', "Commandes slash exécutées par statut")
+metrics.histogram('task_run_seconds', "Durée d'une itération des tâches de fond")
+metrics.counter('task_runs_total', "Itérations des tâches de fond par statut")
+
+def instrument_task(task_name):
+    """Mesure la durée et le statut de chaque itération d'une tâche de fond"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                result = await func(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                metrics.observe('task_run_seconds', time.perf_counter() - started, task=task_name)
+                metrics.inc('task_runs_total', task=task_name, status=status)
+        return wrapper
+    return decorator
+
+class AdaptiveRateLimiter:
+    """Token bucket par hôte dont le débit s'adapte aux réponses (AIMD)
+    
+    Plein débit (max_rate requêtes/s, rafales de burst) tant que les réponses sont
+    saines ; le débit est divisé par deux à chaque signal de saturation (429, 5xx,
+    timeout) puis remonte progressivement. Un Retry-After suspend toutes les
+    requêtes vers l'hôte jusqu'à son échéance, dans la limite de max_block secondes.
+    """
+    
+    def __init__(self, max_rate, burst=1, min_rate=None, recovery=0.25, max_block=60.0):
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else max_rate / 4
+        self.recovery = recovery
+        self.max_block = max_block
+        self._locks = {}
+        self._buckets = {}
+    
+    def _bucket(self, host):
+        return self._buckets.setdefault(host, {
+            'rate': self.max_rate,
+            'tokens': float(self.burst),
+            'updated': time.monotonic(),
+            'blocked_until': 0.0
+        })
+    
+    def rate(self, host):
+        """Débit courant (requêtes/s) vers un hôte"""
+        return self._bucket(host)['rate']
+    
+    async def acquire(self, host):
+        """Attend un jeton pour une requête vers cet hôte"""
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            bucket = self._bucket(host)
+            while True:
+                now = time.monotonic()
+                if bucket['blocked_until'] > now:
+                    await asyncio.sleep(bucket['blocked_until'] - now)
+                    continue
+                if math.isinf(bucket['rate']):
+                    return
+                bucket['tokens'] = min(self.burst, bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+                bucket['updated'] = now
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    return
+                await asyncio.sleep((1 - bucket['tokens']) / bucket['rate'])
+    
+    def on_success(self, host):
+        """Réponse saine : le débit remonte vers max_rate"""
+        bucket = self._bucket(host)
+        bucket['rate'] = min(self.max_rate, bucket['rate'] + self.max_rate * self.recovery)
+    
+    def on_throttle(self, host, retry_after=None):
+        """Signal de saturation : débit divisé par deux, et pause si Retry-After (au plus max_block)"""
+        bucket = self._bucket(host)
+        bucket['rate'] = max(self.min_rate, bucket['rate'] / 2)
+        if retry_after:
+            # Un Retry-After démesuré (p. ex. 3600) ne doit pas figer toutes les requêtes pendant une heure
+            bucket['blocked_until'] = max(bucket['blocked_until'], time.monotonic() + min(retry_after, self.max_block))
+
+class CircuitBreaker:
+    """Disjoncteur devant un service distant (fermé, ouvert, semi-ouvert)
+    
+    Après failure_threshold échecs consécutifs le circuit s'ouvre : les appels sont
+    refusés immédiatement pendant reset_timeout secondes, puis une seule requête
+    de test est autorisée (semi-ouvert). Son succès referme le circuit, son échec
+    le rouvre ; une requête de test sans issue (annulée, erreur inattendue) est
+    abandonnée après reset_timeout secondes et remplacée par une nouvelle.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=5, reset_timeout=300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+    
+    def allow(self):
+        """Indique si un appel peut partir (et réserve la requête de test en semi-ouvert)"""
+        now = time.monotonic()
+        if self.state == self.OPEN and now >= self._opened_at + self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing and now < self._probe_started + self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started = now
+            return True
+        return self.state == self.CLOSED
+    
+    def record_success(self):
+        """Appel réussi : le circuit se referme"""
+        if self.state != self.CLOSED:
+            logger.info("Circuit refermé : le service distant répond à nouveau")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+    
+    def record_failure(self):
+        """Appel en échec : le circuit s'ouvre au seuil, ou dès l'échec d'une requête de test"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit ouvert après {self.failures} échec(s) consécutif(s), pause de {self.reset_timeout}s")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probing = False
+    
+    def retry_at(self):
+        """Heure (UTC) de la prochaine requête de test si le circuit est ouvert, sinon None"""
+        if self.state != self.OPEN:
+            return None
+        remaining = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+        return datetime.now(timezone.utc) + timedelta(seconds=remaining)
+
+class TransientHTTPError(Exception):
+    """Réponse à réessayer (429 ou 5xx), avec le délai Retry-After éventuel (secondes)"""
+    
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    """Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes, ou None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class TTLCache:
+    """Petit cache LRU dont les entrées expirent après ttl secondes"""
+    
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+    
+    def get(self, key):
+        """Retourne la valeur en cache, ou None si absente ou expirée"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def pop(self, key):
+        self._entries.pop(key, None)
+    
+    def clear(self):
+        self._entries.clear()
+
+class LeaderboardCache:
+    """Classement mensuel en mémoire par club, trié par gain décroissant
+    
+    Alimenté à chaque écriture des joueurs d'un club et invalidé lors d'un reset
+    de début de mois : la lecture du meilleur rusheur ne coûte aucune lecture Firestore.
+    """
+    
     def __init__(self):
+        self._boards = {}
+    
+    @staticmethod
+    def gain(player):
+        return player['trophees_actuels'] - player['trophees_debut_mois']
+    
+    def set(self, club_name, players):
+        """Remplace le classement d'un club"""
+        self._boards[club_name] = sorted(players, key=self.gain, reverse=True)
+    
+    def get(self, club_name):
+        """Retourne le classement d'un club, ou None s'il n'est pas en cache"""
+        return self._boards.get(club_name)
+    
+    def invalidate(self, club_name=None):
+        """Invalide le classement d'un club (ou de tous les clubs)"""
+        if club_name is None:
+            self._boards.clear()
+        else:
+            self._boards.pop(club_name, None)
+
+class AsyncStorage(ABC):
+    """Interface asynchrone de stockage (joueurs, clubs, configuration, historique)
+    
+    Les clients des backends sont synchrones : chaque appel est exécuté dans un pool
+    de threads borné pour ne jamais bloquer la boucle d'événements de discord.py.
+    La détection des joueurs modifiés est commune ; chaque backend fournit le
+    chargement des états inconnus (_load_player_states), l'écriture des joueurs
+    modifiés (_write_players) et les autres accès.
+    """
+    
+    backend = None
+    
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.backend)
+        # Dernier état écrit de chaque joueur présent en base (tag -> PLAYER_STATE_FIELDS)
+        self.player_states = {}
+        # Documents lus et écrits depuis le démarrage (benchmarks)
+        self.counters = {'reads': 0, 'writes': 0}
+        self._counters_lock = threading.Lock()
+    
+    async def run(self, func, *args, op=None, **kwargs):
+        """Exécute un appel bloquant dans le pool de threads (durée mesurée par opération)"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            metrics.observe('storage_op_seconds', time.perf_counter() - started, backend=self.backend, op=op or func.__name__)
+    
+    def count(self, op, reads=0, writes=0):
+        """Comptabilise les documents lus et écrits par une opération"""
+        with self._counters_lock:
+            self.counters['reads'] += reads
+            self.counters['writes'] += writes
+        if reads:
+            metrics.inc('storage_reads_total', reads, backend=self.backend, op=op)
+        if writes:
+            metrics.inc('storage_writes_total', writes, backend=self.backend, op=op)
+    
+    def close(self):
+        """Arrête le pool de threads"""
+        self.executor.shutdown(wait=False)
+    
+    # --- Joueurs ---
+    
+    async def upsert_players(self, players_data, club_name, current_time):
+        """Écrit les joueurs d'un club dont les données ont changé
+        
+        Chaque joueur scrapé est comparé à son dernier état connu (player_states) :
+        seuls les joueurs nouveaux ou modifiés sont écrits. trophees_debut_mois n'est
+        écrit qu'à la création du joueur. Les joueurs inconnus sont chargés en une
+        seule lecture. Retourne (joueurs écrits, joueurs créés, joueurs inchangés).
+        """
+        def _upsert():
+            # Charger en une seule requête l'état des joueurs pas encore connus
+            unknown_ids = [p['id'] for p in players_data if p['id'] not in self.player_states]
+            if unknown_ids:
+                self.count('upsert_players', reads=len(unknown_ids))
+                self.player_states.update(self._load_player_states(unknown_ids))
+            
+            changes = self._player_changes(players_data, club_name)
+            written, created = self._write_players(changes, club_name, current_time)
+            return written, created, len(players_data) - len(changes)
+        return await self.run(_upsert, op='upsert_players')
+    
+    def _player_changes(self, players_data, club_name):
+        """Liste des (joueur scrapé, nouvel état, nouveau ?) à écrire"""
+        changes = []
+        for player_data in players_data:
+            state = self.player_states.get(player_data['id'])
+            if state is None:
+                # Nouveau joueur - ici on initialise trophees_debut_mois = trophees_actuels
+                new_state = {
+                    'pseudo': player_data['pseudo'],
+                    'club': club_name,
+                    'trophees_actuels': player_data['trophies'],
+                    'trophees_debut_mois': player_data['trophies'],
+                    'gain_mois': 0
+                }
+                changes.append((player_data, new_state, True))
+                continue
+            
+            new_state = dict(state, pseudo=player_data['pseudo'], club=club_name, trophees_actuels=player_data['trophies'])
+            if state['trophees_debut_mois'] is not None:
+                # Gain du mois stocké pour permettre les requêtes top-N
+                new_state['gain_mois'] = player_data['trophies'] - state['trophees_debut_mois']
+            if new_state != state:
+                changes.append((player_data, new_state, False))
+        return changes
+    
+    @staticmethod
+    def _player_document(player_data, new_state, is_new, current_time):
+        """Champs à écrire (merge) pour un joueur modifié"""
+        data = dict(new_state, id=player_data['id'], updatedAt=current_time)
+        if not is_new:
+            # NE PAS TOUCHER trophees_debut_mois d'un joueur existant
+            del data['trophees_debut_mois']
+        if data['gain_mois'] is None:
+            del data['gain_mois']
+        return data
+    
+    @abstractmethod
+    def _load_player_states(self, player_ids):
+        """Lit l'état (PLAYER_STATE_FIELDS) des joueurs existants parmi player_ids"""
+    
+    @abstractmethod
+    def _write_players(self, changes, club_name, current_time):
+        """Écrit les joueurs modifiés, met à jour player_states et retourne (écrits, créés)"""
+    
+    @abstractmethod
+    async def get_players(self, player_ids):
+        """Lit plusieurs joueurs par leur tag (tag -> document)"""
+    
+    @abstractmethod
+    async def get_club_players(self, club_name):
+        """Retourne tous les joueurs d'un club"""
+    
+    @abstractmethod
+    async def top_players(self, club_name, limit):
+        """Retourne les joueurs d'un club ayant le plus gros gain_mois"""
+    
+    @abstractmethod
+    async def reset_debut_mois(self, club_names, current_time):
+        """Remplace trophees_debut_mois par trophees_actuels pour tous les joueurs des clubs donnés
+        
+        Retourne le nombre de joueurs réinitialisés par club.
+        """
+    
+    # --- Clubs ---
+    
+    @abstractmethod
+    async def get_clubs(self, club_tags):
+        """Lit plusieurs clubs (tag -> document, None si absent)"""
+    
+    @abstractmethod
+    async def upsert_club(self, club_tag, club_data):
+        """Crée ou met à jour un club (retourne True si le club a été créé)"""
+    
+    # --- Configuration ---
+    
+    @abstractmethod
+    async def get_config(self, key):
+        """Retourne un document de configuration, ou None"""
+    
+    @abstractmethod
+    async def set_config(self, key, data):
+        """Écrit (merge) un document de configuration"""
+    
+    @abstractmethod
+    async def delete_config(self, key):
+        """Supprime un document de configuration"""
+    
+    # --- Historique ---
+    
+    @abstractmethod
+    async def append_history(self, club_tag, club_name, current_time, players_data):
+        """Ajoute un relevé (tags et trophées en tableaux parallèles) au document du jour du club"""
+    
+    @abstractmethod
+    async def get_history(self, club_tag, days):
+        """Lit les documents d'historique d'un club pour les jours donnés"""
+    
+    @staticmethod
+    def history_snapshot(current_time, players_data):
+        """Relevé horaire compact d'un club"""
+        return {
+            't': current_time,
+            'tags': [player['id'] for player in players_data],
+            'trophies': [player['trophies'] for player in players_data]
+        }
+
+class AsyncFirestore(AsyncStorage):
+    """Stockage Firestore (client synchrone firebase_admin)"""
+    
+    backend = 'firestore'
+    
+    def __init__(self, db, max_workers=8):
+        super().__init__(max_workers=max_workers)
+        self.db = db
+    
+    # --- Joueurs ---
+    
+    def _load_player_states(self, player_ids):
+        players_ref = self.db.collection('players')
+        refs = [players_ref.document(player_id) for player_id in player_ids]
+        states = {}
+        for snap in self.db.get_all(refs, field_paths=list(PLAYER_STATE_FIELDS)):
+            if snap.exists:
+                data = snap.to_dict() or {}
+                states[snap.id] = {field: data.get(field) for field in PLAYER_STATE_FIELDS}
+        return states
+    
+    def _write_players(self, changes, club_name, current_time):
+        """Écrit par WriteBatch (merge), par lots de FIRESTORE_BATCH_LIMIT"""
+        players_ref = self.db.collection('players')
+        written = 0
+        created = 0
+        for start in range(0, len(changes), FIRESTORE_BATCH_LIMIT):
+            chunk = changes[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = self.db.batch()
+            
+            for player_data, new_state, is_new in chunk:
+                batch.set(players_ref.document(player_data['id']),
+                          self._player_document(player_data, new_state, is_new, current_time), merge=True)
+            
+            try:
+                batch.commit()
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture d'un lot de {len(chunk)} joueurs pour {club_name}: {e}")
+                continue
+            self.count('upsert_players', writes=len(chunk))
+            
+            # Ne mettre à jour l'état connu qu'une fois le lot validé
+            for player_data, new_state, is_new in chunk:
+                self.player_states[player_data['id']] = new_state
+                created += is_new
+            written += len(chunk)
+        return written, created
+    
+    async def get_players(self, player_ids):
+        """Lit plusieurs joueurs par leur tag en un seul get_all (tag -> document)"""
+        def _get_all():
+            players_ref = self.db.collection('players')
+            refs = [players_ref.document(player_id) for player_id in player_ids]
+            self.count('get_players', reads=len(refs))
+            return {snap.id: snap.to_dict() for snap in self.db.get_all(refs) if snap.exists}
+        return await self.run(_get_all, op='get_players')
+    
+    async def get_club_players(self, club_name):
+        """Retourne tous les joueurs d'un club"""
+        def _stream():
+            query = self.db.collection('players').where('club', '==', club_name)
+            players = [doc.to_dict() for doc in query.stream()]
+            self.count('get_club_players', reads=len(players))
+            return players
+        return await self.run(_stream, op='get_club_players')
+    
+    async def top_players(self, club_name, limit):
+        """Retourne les joueurs d'un club ayant le plus gros gain_mois (index composite club + gain_mois)"""
+        def _top():
+            query = (self.db.collection('players')
+                     .where('club', '==', club_name)
+                     .order_by('gain_mois', direction=firestore.Query.DESCENDING)
+                     .limit(limit))
+            players = [doc.to_dict() for doc in query.stream()]
+            self.count('top_players', reads=len(players))
+            return players
+        return await self.run(_top, op='top_players')
+    
+    async def reset_debut_mois(self, club_names, current_time):
+        """Réinitialise les joueurs des clubs donnés par WriteBatch (lots de FIRESTORE_BATCH_LIMIT)
+        
+        Lève l'erreur du premier lot refusé, pour que la réinitialisation puisse être relancée.
+        """
+        def _commit(pending):
+            batch = self.db.batch()
+            for doc_id, player_data in pending:
+                batch.update(self.db.collection('players').document(doc_id), {
+                    'trophees_debut_mois': player_data['trophees_actuels'],
+                    'gain_mois': 0,
+                    'updatedAt': current_time
+                })
+            batch.commit()
+            self.count('reset_debut_mois', writes=len(pending))
+            # Ne mettre à jour l'état connu qu'une fois le lot validé
+            for doc_id, player_data in pending:
+                self.player_states[doc_id] = dict(
+                    {field: player_data.get(field) for field in PLAYER_STATE_FIELDS},
+                    trophees_debut_mois=player_data['trophees_actuels'],
+                    gain_mois=0
+                )
+        
+        def _reset():
+            updated_counts = {}
+            pending = []
+            for club_name in club_names:
+                query = self.db.collection('players').where('club', '==', club_name)
+                updated_counts[club_name] = 0
+                for doc in query.stream():
+                    pending.append((doc.id, doc.to_dict()))
+                    updated_counts[club_name] += 1
+                    if len(pending) == FIRESTORE_BATCH_LIMIT:
+                        _commit(pending)
+                        pending = []
+                self.count('reset_debut_mois', reads=updated_counts[club_name])
+            if pending:
+                _commit(pending)
+            return updated_counts
+        return await self.run(_reset, op='reset_debut_mois')
+    
+    # --- Clubs ---
+    
+    async def get_clubs(self, club_tags):
+        """Lit plusieurs clubs en un seul get_all (tag -> document, None si absent)"""
+        def _get_all():
+            clubs_ref = self.db.collection('clubs')
+            refs = [clubs_ref.document(club_tag) for club_tag in club_tags]
+            self.count('get_clubs', reads=len(refs))
+            return {snap.id: (snap.to_dict() if snap.exists else None) for snap in self.db.get_all(refs)}
+        return await self.run(_get_all, op='get_clubs')
+    
+    async def upsert_club(self, club_tag, club_data):
+        """Crée ou met à jour un club (retourne True si le club a été créé)"""
+        def _upsert():
+            club_ref = self.db.collection('clubs').document(club_tag)
+            self.count('upsert_club', reads=1, writes=1)
+            if club_ref.get().exists:
+                club_ref.update(club_data)
+                return False
+            club_ref.set(club_data)
+            return True
+        return await self.run(_upsert, op='upsert_club')
+    
+    # --- Configuration ---
+    
+    async def get_config(self, key):
+        """Retourne un document de configuration, ou None"""
+        def _get():
+            config_doc = self.db.collection('config').document(key).get()
+            self.count('get_config', reads=1)
+            return config_doc.to_dict() if config_doc.exists else None
+        return await self.run(_get, op='get_config')
+    
+    async def set_config(self, key, data):
+        """Écrit (merge) un document de configuration"""
+        await self.run(self.db.collection('config').document(key).set, data, merge=True, op='set_config')
+        self.count('set_config', writes=1)
+    
+    async def delete_config(self, key):
+        """Supprime un document de configuration"""
+        await self.run(self.db.collection('config').document(key).delete, op='delete_config')
+        self.count('delete_config', writes=1)
+    
+    # --- Historique ---
+    
+    @staticmethod
+    def history_doc_id(club_tag, day):
+        """Un document d'historique par club et par jour (UTC)"""
+        return f"{club_tag}_{day.strftime('%Y-%m-%d')}"
+    
+    async def append_history(self, club_tag, club_name, current_time, players_data):
+        """Ajoute un relevé (tags et trophées en tableaux parallèles) au document du jour du club"""
+        snapshot = self.history_snapshot(current_time, players_data)
+        def _append():
+            history_ref = self.db.collection('history').document(self.history_doc_id(club_tag, current_time))
+            history_ref.set({
+                'club': club_name,
+                'tag': club_tag,
+                'date': current_time.strftime('%Y-%m-%d'),
+                'snapshots': firestore.ArrayUnion([snapshot])
+            }, merge=True)
+            self.count('append_history', writes=1)
+        await self.run(_append, op='append_history')
+    
+    async def get_history(self, club_tag, days):
+        """Lit en un seul get_all les documents d'historique d'un club pour les jours donnés"""
+        def _get_all():
+            history_ref = self.db.collection('history')
+            refs = [history_ref.document(self.history_doc_id(club_tag, day)) for day in days]
+            self.count('get_history', reads=len(refs))
+            return [snap.to_dict() for snap in self.db.get_all(refs) if snap.exists]
+        return await self.run(_get_all, op='get_history')
+
+def _json_default(value):
+    """Sérialise les dates des documents stockés en JSON (SQLite)"""
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+def _json_object_hook(value):
+    """Restaure les dates sérialisées par _json_default"""
+    if len(value) == 1 and '$date' in value:
+        return datetime.fromisoformat(value['$date'])
+    return value
+
+def dump_document(data):
+    """Document (dict) -> texte JSON stocké en base"""
+    return json.dumps(data, default=_json_default, ensure_ascii=False)
+
+def load_document(text):
+    """Texte JSON stocké en base -> document (dict), ou None"""
+    return json.loads(text, object_hook=_json_object_hook) if text is not None else None
+
+class AsyncSQLite(AsyncStorage):
+    """Stockage SQLite local (sans latence réseau ni quota)
+    
+    Les joueurs sont une table typée indexée sur (club, gain_mois) ; clubs,
+    configuration et historique sont des documents JSON. Une seule connexion,
+    utilisée par un pool d'un seul thread : les accès sont sérialisés.
+    """
+    
+    backend = 'sqlite'
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS players (
+            id TEXT PRIMARY KEY,
+            pseudo TEXT,
+            club TEXT,
+            trophees_actuels INTEGER,
+            trophees_debut_mois INTEGER,
+            gain_mois INTEGER,
+            updatedAt TEXT
+        );
+        CREATE INDEX IF NOT EXISTS players_club_gain ON players (club, gain_mois DESC);
+        CREATE TABLE IF NOT EXISTS clubs (tag TEXT PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS history (
+            tag TEXT NOT NULL,
+            date TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (tag, date)
+        );
+    """
+    PLAYER_COLUMNS = ('id', 'pseudo', 'club', 'trophees_actuels', 'trophees_debut_mois', 'gain_mois', 'updatedAt')
+    
+    def __init__(self, path):
+        super().__init__(max_workers=1)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+    
+    def close(self):
+        """Arrête le pool de threads et ferme la base"""
+        self.executor.shutdown(wait=True)
+        self.conn.close()
+    
+    @classmethod
+    def _player_from_row(cls, row):
+        """Document joueur équivalent à Firestore (champs NULL absents)"""
+        player = {column: row[column] for column in cls.PLAYER_COLUMNS if row[column] is not None}
+        if 'updatedAt' in player:
+            player['updatedAt'] = datetime.fromisoformat(player['updatedAt'])
+        return player
+    
+    def _select_players(self, where, params):
+        rows = self.conn.execute(f"SELECT * FROM players WHERE {where}", params).fetchall()
+        return [self._player_from_row(row) for row in rows]
+    
+    # --- Joueurs ---
+    
+    def _load_player_states(self, player_ids):
+        states = {}
+        # Par tranches : SQLite limite le nombre de paramètres d'une requête
+        for start in range(0, len(player_ids), 500):
+            chunk = player_ids[start:start + 500]
+            for player in self._select_players(f"id IN ({','.join('?' * len(chunk))})", chunk):
+                states[player['id']] = {field: player.get(field) for field in PLAYER_STATE_FIELDS}
+        return states
+    
+    def _write_players(self, changes, club_name, current_time):
+        """Écrit tous les joueurs modifiés dans une seule transaction"""
+        rows = []
+        for player_data, new_state, is_new in changes:
+            data = self._player_document(player_data, new_state, is_new, current_time)
+            rows.append((data['id'], data['pseudo'], data['club'], data['trophees_actuels'],
+                         data.get('trophees_debut_mois'), data.get('gain_mois'), current_time.isoformat()))
+        try:
+            with self.conn:
+                # trophees_debut_mois n'est jamais réécrit pour un joueur existant
+                self.conn.executemany("""
+                    INSERT INTO players (id, pseudo, club, trophees_actuels, trophees_debut_mois, gain_mois, updatedAt)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        pseudo = excluded.pseudo,
+                        club = excluded.club,
+                        trophees_actuels = excluded.trophees_actuels,
+                        gain_mois = COALESCE(excluded.gain_mois, players.gain_mois),
+                        updatedAt = excluded.updatedAt
+                """, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Erreur lors de l'écriture de {len(rows)} joueurs pour {club_name}: {e}")
+            return 0, 0
+        self.count('upsert_players', writes=len(rows))
+        
+        for player_data, new_state, is_new in changes:
+            self.player_states[player_data['id']] = new_state
+        return len(changes), sum(is_new for _, _, is_new in changes)
+    
+    async def get_players(self, player_ids):
+        """Lit plusieurs joueurs par leur tag en une requête (tag -> document)"""
+        if not player_ids:
+            return {}
+        def _get():
+            self.count('get_players', reads=len(player_ids))
+            players = self._select_players(f"id IN ({','.join('?' * len(player_ids))})", list(player_ids))
+            return {player['id']: player for player in players}
+        return await self.run(_get, op='get_players')
+    
+    async def get_club_players(self, club_name):
+        """Retourne tous les joueurs d'un club"""
+        def _get():
+            players = self._select_players("club = ?", (club_name,))
+            self.count('get_club_players', reads=len(players))
+            return players
+        return await self.run(_get, op='get_club_players')
+    
+    async def top_players(self, club_name, limit):
+        """Retourne les joueurs d'un club ayant le plus gros gain_mois (index club + gain_mois)"""
+        def _top():
+            players = self._select_players(
+                "club = ? AND gain_mois IS NOT NULL ORDER BY gain_mois DESC LIMIT ?", (club_name, limit)
+            )
+            self.count('top_players', reads=len(players))
+            return players
+        return await self.run(_top, op='top_players')
+    
+    async def reset_debut_mois(self, club_names, current_time):
+        """Réinitialise les joueurs des clubs donnés dans une seule transaction"""
+        def _reset():
+            updated_counts = {}
+            with self.conn:
+                for club_name in club_names:
+                    updated_counts[club_name] = self.conn.execute(
+                        "UPDATE players SET trophees_debut_mois = trophees_actuels, gain_mois = 0, updatedAt = ? WHERE club = ?",
+                        (current_time.isoformat(), club_name)
+                    ).rowcount
+            for club_name in club_names:
+                for player in self._select_players("club = ?", (club_name,)):
+                    self.player_states[player['id']] = {field: player.get(field) for field in PLAYER_STATE_FIELDS}
+            total = sum(updated_counts.values())
+            self.count('reset_debut_mois', reads=total, writes=total)
+            return updated_counts
+        return await self.run(_reset, op='reset_debut_mois')
+    
+    # --- Documents JSON (clubs, configuration) ---
+    
+    def _get_document(self, table, key_column, key):
+        row = self.conn.execute(f"SELECT data FROM {table} WHERE {key_column} = ?", (key,)).fetchone()
+        return load_document(row['data']) if row else None
+    
+    def _merge_document(self, table, key_column, key, data):
+        """Écrit data fusionné avec le document existant ; retourne True si créé"""
+        with self.conn:
+            current = self._get_document(table, key_column, key)
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {table} ({key_column}, data) VALUES (?, ?)",
+                (key, dump_document({**(current or {}), **data}))
+            )
+        return current is None
+    
+    # --- Clubs ---
+    
+    async def get_clubs(self, club_tags):
+        """Lit plusieurs clubs (tag -> document, None si absent)"""
+        def _get():
+            self.count('get_clubs', reads=len(club_tags))
+            return {club_tag: self._get_document('clubs', 'tag', club_tag) for club_tag in club_tags}
+        return await self.run(_get, op='get_clubs')
+    
+    async def upsert_club(self, club_tag, club_data):
+        """Crée ou met à jour un club (retourne True si le club a été créé)"""
+        def _upsert():
+            self.count('upsert_club', reads=1, writes=1)
+            return self._merge_document('clubs', 'tag', club_tag, club_data)
+        return await self.run(_upsert, op='upsert_club')
+    
+    # --- Configuration ---
+    
+    async def get_config(self, key):
+        """Retourne un document de configuration, ou None"""
+        def _get():
+            self.count('get_config', reads=1)
+            return self._get_document('config', 'key', key)
+        return await self.run(_get, op='get_config')
+    
+    async def set_config(self, key, data):
+        """Écrit (merge) un document de configuration"""
+        def _set():
+            self.count('set_config', writes=1)
+            self._merge_document('config', 'key', key, data)
+        await self.run(_set, op='set_config')
+    
+    async def delete_config(self, key):
+        """Supprime un document de configuration"""
+        def _delete():
+            with self.conn:
+                self.conn.execute("DELETE FROM config WHERE key = ?", (key,))
+            self.count('delete_config', writes=1)
+        await self.run(_delete, op='delete_config')
+    
+    # --- Historique ---
+    
+    async def append_history(self, club_tag, club_name, current_time, players_data):
+        """Ajoute un relevé (tags et trophées en tableaux parallèles) au document du jour du club"""
+        snapshot = self.history_snapshot(current_time, players_data)
+        day = current_time.strftime('%Y-%m-%d')
+        def _append():
+            with self.conn:
+                row = self.conn.execute("SELECT data FROM history WHERE tag = ? AND date = ?", (club_tag, day)).fetchone()
+                history_doc = load_document(row['data']) if row else {'snapshots': []}
+                history_doc.update(club=club_name, tag=club_tag, date=day)
+                if snapshot not in history_doc['snapshots']:
+                    history_doc['snapshots'].append(snapshot)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO history (tag, date, data) VALUES (?, ?, ?)",
+                    (club_tag, day, dump_document(history_doc))
+                )
+            self.count('append_history', writes=1)
+        await self.run(_append, op='append_history')
+    
+    async def get_history(self, club_tag, days):
+        """Lit les documents d'historique d'un club pour les jours donnés"""
+        def _get():
+            dates = [day.strftime('%Y-%m-%d') for day in days]
+            self.count('get_history', reads=len(dates))
+            rows = self.conn.execute(
+                f"SELECT data FROM history WHERE tag = ? AND date IN ({','.join('?' * len(dates))}) ORDER BY date",
+                (club_tag, *dates)
+            ).fetchall()
+            return [load_document(row['data']) for row in rows]
+        return await self.run(_get, op='get_history')
+
+class BrawlStarsBot:
+    def __init__(self, db=None, store=None):
         # Initialisation Discord
         intents = discord.Intents.default()
         intents.message_content = True
         self.bot = commands.Bot(command_prefix='!', intents=intents)
         
-        # Initialisation Firebase
-        self.init_firebase()
+        # Initialisation du stockage (ou client / stockage injecté, p. ex. pour les benchmarks)
+        if store is not None:
+            self.db = None
+            self.store = store
+        elif db is not None:
+            self.db = db
+            self.store = AsyncFirestore(db)
+        else:
+            self.init_storage()
+        
+        # Site scrapé (surchargeable pour viser le faux serveur des benchmarks)
+        self.brawlace_base_url = os.environ.get('BRAWLACE_BASE_URL', 'https://brawlace.com').rstrip('/')
         
         # Configuration des clubs
         self.clubs = {
@@ -39,18 +1169,86 @@ class BrawlStarsBot:
             "Mini Prairie": "#JY89VGGP",
         }
         
-        # Flask pour le ping d'Uptime Robot
-        self.app = Flask(__name__)
+        # Mise à jour des clubs : nombre de clubs traités en parallèle, débit maximal
+        # vers brawlace (requêtes/s, rafale) et nouvelles tentatives avec backoff
+        # exponentiel (secondes) sur 429, 5xx ou timeout
+        self.refresh_concurrency = 3
+        self.scrape_rate = 1.0
+        self.scrape_burst = 3
+        self.scrape_max_retries = 3
+        self.scrape_backoff_base = 1.0
+        self.scrape_backoff_max = 60.0
+        # Mises à jour demandées par une commande (/update) : une seule tentative limitée
+        # à interactive_timeout secondes, pour répondre vite pendant une panne
+        self.interactive_timeout = 10.0
+        self.rate_limiter = AdaptiveRateLimiter(self.scrape_rate, burst=self.scrape_burst, max_block=self.scrape_backoff_max)
+        
+        # Disjoncteur devant brawlace : échec immédiat pendant une panne, test toutes les 5 minutes ;
+        # au-delà de stale_after sans mise à jour réussie, les données affichées sont signalées
+        self.circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=300)
+        self.stale_after = timedelta(hours=2)
+        
+        # Réinitialisation mensuelle automatique de tous les clubs (le 1er à 00:00 UTC), optionnelle
+        self.auto_monthly_reset_enabled = os.environ.get('AUTO_MONTHLY_RESET', '').lower() in ('1', 'true', 'oui')
+        self.monthly_reset_lock = asyncio.Lock()
+        
+        # Verrou par club (nom -> asyncio.Lock) : l'écriture des joueurs d'une mise à jour
+        # et la réinitialisation de début de mois d'un même club ne se chevauchent jamais
+        self.club_locks = {}
+        
+        # Session HTTP partagée par tous les scrapings (créée au démarrage)
+        self.http_session = None
+        
+        # Validateurs de la dernière page club persistée avec succès
+        # (tag -> etag, last_modified, content_hash, member_ids)
+        self.page_validators = {}
+        
+        # Classements mensuels en mémoire (meilleurs rusheurs)
+        self.leaderboards = LeaderboardCache()
+        
+        # Documents joueurs récemment consultés via /mytrophy
+        self.player_cache = TTLCache(maxsize=256, ttl=300)
+        
+        # Documents clubs en mémoire (tag -> document), tenus à jour à chaque écriture
+        self.club_snapshots = {}
+        
+        # Dernière fois qu'un joueur a été vu dans un club (tag -> datetime)
+        self.player_last_seen = {}
+        
+        # Dernière mise à jour réussie de chaque club (tag -> datetime)
+        self.club_last_success = {}
+        
+        # Mises à jour de club en cours (tag -> tâche partagée) et résultats récents
+        # (tag -> (instant monotonic, rapport)), réutilisés pendant refresh_fresh_for secondes
+        self.refresh_in_flight = {}
+        self.recent_refreshes = {}
+        self.refresh_fresh_for = 60
+        
+        # Planification de auto_update : 'burst' (tous les clubs en début d'heure) ou
+        # 'staggered' (clubs répartis uniformément sur refresh_interval, l'intervalle de la tâche)
+        self.refresh_schedule = os.environ.get('REFRESH_SCHEDULE', 'burst').lower()
+        if self.refresh_schedule not in ('burst', 'staggered'):
+            raise ValueError(f"REFRESH_SCHEDULE inconnu: {self.refresh_schedule} (burst ou staggered)")
+        
+        # Serveur HTTP (ping d'Uptime Robot), sur la même boucle que le bot Discord
+        self.web_app = web.Application()
+        self.web_runner = None
         
-        # Variable pour stocker le dernier message des rusheurs
-        self.last_rusheur_message = None
+        # Dernière mise à jour automatique (pour la route de santé)
+        self.last_refresh_at = None
+        self.last_refresh_results = {}
+        
+        # Tableau des meilleurs rusheurs : canal, message édité sur place et empreinte
+        # du classement affiché (persistés dans config/rusheur_board)
         self.rusheur_channel_id = None  # À configurer via une commande
+        self.rusheur_message_id = None
+        self.rusheur_standings_hash = None
         
         # ID du rôle Modo
         self.MODO_ROLE_ID = 1185678999335219311
         
         self.setup_discord_events()
-        self.setup_flask_routes()
+        self.setup_web_routes()
     
     def has_modo_role(self, interaction: discord.Interaction) -> bool:
         """Vérifie si l'utilisateur a le rôle Modo"""
@@ -94,6 +1292,23 @@ class BrawlStarsBot:
             logger.error(f"Erreur lors de la vérification du rôle Modo: {e}")
             return False
         
+    def set_command_status(self, interaction, status):
+        """Statut d'une commande pour la métrique discord_commands_total ('ok' par défaut, 'error', 'denied')"""
+        interaction.extras['command_status'] = status
+    
+    def init_storage(self):
+        """Choisit le stockage d'après STORAGE_BACKEND (firestore par défaut, ou sqlite)"""
+        backend = os.environ.get('STORAGE_BACKEND', 'firestore').lower()
+        if backend == 'firestore':
+            self.init_firebase()
+        elif backend == 'sqlite':
+            sqlite_path = os.environ.get('SQLITE_PATH', 'brawlstars.db')
+            self.db = None
+            self.store = AsyncSQLite(sqlite_path)
+            logger.info(f"Stockage SQLite initialisé ({sqlite_path})")
+        else:
+            raise ValueError(f"STORAGE_BACKEND inconnu: {backend} (firestore ou sqlite)")
+    
     def init_firebase(self):
         """Initialise Firebase avec le secret file"""
         try:
@@ -104,92 +1319,222 @@ class BrawlStarsBot:
             cred = credentials.Certificate(firebase_key)
             firebase_admin.initialize_app(cred)
             self.db = firestore.client()
+            # Tous les accès passent par la couche asynchrone
+            self.store = AsyncFirestore(self.db)
             logger.info("Firebase initialisé avec succès")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation Firebase: {e}")
             raise
     
-    def setup_flask_routes(self):
-        """Configure les routes Flask pour le ping"""
-        @self.app.route('/')
-        def health_check():
-            return "Bot is running!", 200
+    def setup_web_routes(self):
+        """Configure les routes HTTP pour le ping"""
+        async def health_check(request):
+            # État du bot lu directement : le serveur tourne sur la même boucle
+            latency = self.bot.latency
+            return web.json_response({
+                'status': 'Bot is running!',
+                'discord_ready': self.bot.is_ready(),
+                'latency_ms': round(latency * 1000) if math.isfinite(latency) else None,
+                'guilds': len(self.bot.guilds),
+                'last_refresh_at': self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+                'brawlace_circuit': self.circuit_breaker.state,
+                'clubs': {
+                    club_name: result['status'] for club_name, result in self.last_refresh_results.items()
+                }
+            })
+        
+        async def ping(request):
+            return web.Response(text="pong")
+        
+        async def metrics_export(request):
+            return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+        
+        self.web_app.router.add_get('/', health_check)
+        self.web_app.router.add_get('/ping', ping)
+        self.web_app.router.add_get('/metrics', metrics_export)
+    
+    async def start_web_server(self):
+        """Démarre le serveur HTTP sur $PORT dans la boucle d'événements courante"""
+        self.web_runner = web.AppRunner(self.web_app, access_log=None)
+        await self.web_runner.setup()
+        port = int(os.environ.get('PORT', 5000))
+        await web.TCPSite(self.web_runner, '0.0.0.0', port).start()
+        logger.info(f"Serveur HTTP démarré sur le port {port}")
+    
+    async def stop_web_server(self):
+        """Arrête le serveur HTTP"""
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+            self.web_runner = None
+    
+    async def setup_hook(self):
+        """Synchronise les commandes si besoin et démarre les tâches de fond (une seule fois)"""
+        await self.sync_command_tree()
+        
+        # Démarrer la mise à jour automatique
+        self.auto_update.start()
+        logger.info("Mise à jour automatique programmée toutes les heures")
+        
+        # Démarrer l'envoi automatique des meilleurs rusheurs
+        self.auto_rusheur_update.start()
+        logger.info("Envoi automatique des meilleurs rusheurs programmé toutes les demi-heures")
+        
+        # Réinitialisation mensuelle automatique (optionnelle)
+        if self.auto_monthly_reset_enabled:
+            self.auto_monthly_reset.start()
+            logger.info("Réinitialisation mensuelle automatique programmée le 1er de chaque mois à 00:00 UTC")
+    
+    def command_tree_fingerprint(self):
+        """Empreinte des signatures des commandes enregistrées (et de l'application)"""
+        commands_payload = sorted((command.to_dict() for command in self.bot.tree.get_commands()), key=lambda command: command['name'])
+        payload = json.dumps({'application_id': self.bot.application_id, 'commands': commands_payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    async def sync_command_tree(self):
+        """Synchronise les commandes slash seulement si leur empreinte a changé depuis la dernière synchronisation"""
+        fingerprint = self.command_tree_fingerprint()
+        try:
+            sync_state = await self.store.get_config('command_sync')
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de l'empreinte des commandes: {e}")
+            sync_state = None
+        
+        if sync_state and sync_state.get('fingerprint') == fingerprint:
+            logger.info("Commandes inchangées depuis la dernière synchronisation, sync ignorée")
+            return
         
-        @self.app.route('/ping')
-        def ping():
-            return "pong", 200
+        try:
+            synced = await self.bot.tree.sync()
+            logger.info(f"Synchronisé {len(synced)} commande(s)")
+        except Exception as e:
+            logger.error(f"Erreur lors de la synchronisation: {e}")
+            return
+        
+        try:
+            await self.store.set_config('command_sync', {
+                'fingerprint': fingerprint,
+                'syncedAt': datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement de l'empreinte des commandes: {e}")
     
     def setup_discord_events(self):
         """Configure les événements Discord"""
         
+        # Synchronisation des commandes et démarrage des tâches : une seule fois, après la connexion
+        self.bot.setup_hook = self.setup_hook
+        
         @self.bot.event
         async def on_ready():
+            # Appelé aussi à chaque reconnexion à la gateway : rien à (re)démarrer ici
             logger.info(f'{self.bot.user} est connecté!')
-            try:
-                synced = await self.bot.tree.sync()
-                logger.info(f"Synchronisé {len(synced)} commande(s)")
-            except Exception as e:
-                logger.error(f"Erreur lors de la synchronisation: {e}")
-            
-            # Démarrer la mise à jour automatique
-            self.auto_update.start()
-            logger.info("Mise à jour automatique programmée toutes les heures")
-            
-            # Démarrer l'envoi automatique des meilleurs rusheurs
-            self.auto_rusheur_update.start()
-            logger.info("Envoi automatique des meilleurs rusheurs programmé toutes les demi-heures")
         
-        @self.bot.tree.command(name="mytrophy", description="Affiche vos trophées actuels")
+        def record_command(interaction, command_name, status):
+            """Latence d'une commande depuis la création de l'interaction par Discord"""
+            latency = (datetime.now(timezone.utc) - interaction.created_at).total_seconds()
+            metrics.observe('discord_command_seconds', max(latency, 0.0), command=command_name)
+            metrics.inc('discord_commands_total', command=command_name, status=status)
+        
+        @self.bot.event
+        async def on_app_command_completion(interaction, command):
+            # Les commandes gèrent leurs erreurs elles-mêmes et indiquent leur statut (set_command_status)
+            record_command(interaction, command.qualified_name, interaction.extras.get('command_status', 'ok'))
+        
+        @self.bot.tree.error
+        async def on_app_command_error(interaction, error):
+            command_name = interaction.command.qualified_name if interaction.command else 'inconnue'
+            record_command(interaction, command_name, 'error')
+            logger.error(f"Erreur dans la commande {command_name}: {error}", exc_info=error)
+        
+        @self.bot.tree.command(name="mytrophy", description="Affiche vos trophées actuels (plusieurs tags possibles, séparés par des espaces)")
         async def mytrophy(interaction: discord.Interaction, player_id: str):
             await interaction.response.defer()
             
             try:
-                # Nettoyer l'ID du joueur
-                clean_id = player_id.replace('#', '').upper()
-                if not clean_id.startswith('#'):
-                    clean_id = '#' + clean_id
+                # Nettoyer les IDs des joueurs (un ou plusieurs tags)
+                clean_ids = []
+                for raw_id in re.split(r'[\s,;]+', player_id.strip()):
+                    if not raw_id:
+                        continue
+                    clean_id = raw_id.replace('#', '').upper()
+                    if not clean_id.startswith('#'):
+                        clean_id = '#' + clean_id
+                    if clean_id not in clean_ids:
+                        clean_ids.append(clean_id)
+                
+                if not clean_ids:
+                    await interaction.followup.send("Merci d'indiquer au moins un tag de joueur.")
+                    return
                 
-                # Chercher le joueur dans Firestore
-                players_ref = self.db.collection('players')
-                query = players_ref.where('id', '==', clean_id).limit(1)
-                docs = query.stream()
+                # Limiter le mode groupé pour rester dans les limites d'un embed
+                clean_ids = clean_ids[:10]
                 
-                player_doc = None
-                for doc in docs:
-                    player_doc = doc.to_dict()
-                    break
+                # Lecture directe des documents (clé = tag), avec cache
+                player_docs = await self.get_players(clean_ids)
                 
-                if not player_doc:
-                    await interaction.followup.send(f"Joueur {clean_id} non trouvé dans la base de données.")
+                if len(clean_ids) == 1:
+                    clean_id = clean_ids[0]
+                    player_doc = player_docs.get(clean_id)
+                    
+                    if not player_doc:
+                        await interaction.followup.send(f"Joueur {clean_id} non trouvé dans la base de données.")
+                        return
+                    
+                    embed = discord.Embed(
+                        title=f"🏆 Trophées de {player_doc['pseudo']}",
+                        color=0x00ff00
+                    )
+                    embed.add_field(name="Trophées actuels", value=f"{player_doc['trophees_actuels']:,}", inline=True)
+                    embed.add_field(name="Trophées début mois", value=f"{player_doc['trophees_debut_mois']:,}", inline=True)
+                    
+                    diff = player_doc['trophees_actuels'] - player_doc['trophees_debut_mois']
+                    diff_emoji = "📈" if diff > 0 else "📉" if diff < 0 else "➖"
+                    embed.add_field(name="Différence", value=f"{diff_emoji} {diff:+,}", inline=True)
+                    
+                    embed.add_field(name="Club", value=player_doc['club'], inline=True)
+                    
+                    if 'updatedAt' in player_doc:
+                        last_update = player_doc['updatedAt']
+                        footer = f"Dernière mise à jour: {last_update.strftime('%d/%m/%Y %H:%M')}"
+                        last_seen = self.player_last_seen.get(clean_id)
+                        if last_seen:
+                            footer += f" • Vu le: {last_seen.strftime('%d/%m/%Y %H:%M')}"
+                        embed.set_footer(text=footer)
+                    
+                    await interaction.followup.send(embed=embed)
                     return
                 
+                # Mode groupé : un champ par joueur
                 embed = discord.Embed(
-                    title=f"🏆 Trophées de {player_doc['pseudo']}",
+                    title=f"🏆 Trophées de {len(clean_ids)} joueurs",
                     color=0x00ff00
                 )
-                embed.add_field(name="Trophées actuels", value=f"{player_doc['trophees_actuels']:,}", inline=True)
-                embed.add_field(name="Trophées début mois", value=f"{player_doc['trophees_debut_mois']:,}", inline=True)
-                
-                diff = player_doc['trophees_actuels'] - player_doc['trophees_debut_mois']
-                diff_emoji = "📈" if diff > 0 else "📉" if diff < 0 else "➖"
-                embed.add_field(name="Différence", value=f"{diff_emoji} {diff:+,}", inline=True)
-                
-                embed.add_field(name="Club", value=player_doc['club'], inline=True)
-                
-                if 'updatedAt' in player_doc:
-                    last_update = player_doc['updatedAt']
-                    embed.set_footer(text=f"Dernière mise à jour: {last_update.strftime('%d/%m/%Y %H:%M')}")
+                for clean_id in clean_ids:
+                    player_doc = player_docs.get(clean_id)
+                    if not player_doc:
+                        embed.add_field(name=f"❓ {clean_id}", value="Non trouvé dans la base de données", inline=False)
+                        continue
+                    
+                    diff = player_doc['trophees_actuels'] - player_doc['trophees_debut_mois']
+                    diff_emoji = "📈" if diff > 0 else "📉" if diff < 0 else "➖"
+                    embed.add_field(
+                        name=f"{player_doc['pseudo']} ({clean_id})",
+                        value=f"🏆 {player_doc['trophees_actuels']:,} • {diff_emoji} {diff:+,} ce mois • {player_doc['club']}",
+                        inline=False
+                    )
                 
                 await interaction.followup.send(embed=embed)
                 
             except Exception as e:
                 logger.error(f"Erreur dans mytrophy: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la récupération des données.")
         
         @self.bot.tree.command(name="update", description="Met à jour tous les joueurs d'un club")
         async def update_club(interaction: discord.Interaction, club_name: str):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -202,11 +1547,35 @@ class BrawlStarsBot:
             
             try:
                 club_tag = self.clubs[club_name]
-                updated_count = await self.scrape_and_update_club(club_tag, club_name)
+                result = await self.refresh_club(club_tag, club_name, interactive=True)
+                
+                if result['status'] == 'error':
+                    # Servir les dernières données valides en indiquant leur ancienneté
+                    await self.get_club_snapshots([club_tag])
+                    embed = discord.Embed(
+                        title="⚠️ Mise à jour impossible",
+                        description=f"Club: **{club_name}**\n{result['error']}",
+                        color=0xff9900
+                    )
+                    embed.add_field(
+                        name="🕑 Données conservées",
+                        value=self.staleness_note(self.last_good_update(club_tag)),
+                        inline=False
+                    )
+                    self.set_command_status(interaction, 'error')
+                    await interaction.followup.send(embed=embed)
+                    return
+                
+                if result['status'] == 'unchanged':
+                    description = f"Club: **{club_name}**\nAucun changement depuis la dernière mise à jour"
+                else:
+                    description = f"Club: **{club_name}**\nJoueurs mis à jour: **{result['updated']}**\nJoueurs inchangés: **{result['unchanged']}**"
+                if result['shared']:
+                    description += "\n*(mise à jour déjà en cours ou terminée il y a moins d'une minute : résultat partagé)*"
                 
                 embed = discord.Embed(
                     title="✅ Mise à jour terminée",
-                    description=f"Club: **{club_name}**\nJoueurs mis à jour: **{updated_count}**",
+                    description=description,
                     color=0x00ff00
                 )
                 embed.add_field(
@@ -218,12 +1587,14 @@ class BrawlStarsBot:
                 
             except Exception as e:
                 logger.error(f"Erreur dans update_club: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la mise à jour.")
         
         @self.bot.tree.command(name="meilleur_rusheur", description="Affiche le meilleur rusheur de chaque club")
         async def meilleur_rusheur(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -254,45 +1625,86 @@ class BrawlStarsBot:
                 await interaction.followup.send(embed=embed)
                 
             except Exception as e:
-                logger.error(f"Erreur dans meilleur_rusheur: {e}")
-                await interaction.followup.send("Une erreur s'est produite lors de la récupération des données.")
+                logger.error(f"Erreur dans meilleur_rusheur: {e}")
+                self.set_command_status(interaction, 'error')
+                await interaction.followup.send("Une erreur s'est produite lors de la récupération des données.")
+        
+        @self.bot.tree.command(name="top_rusheurs", description="Affiche le top des rusheurs du mois d'un club")
+        async def top_rusheurs(interaction: discord.Interaction, club_name: str, nombre: int = 10):
+            # Vérification du rôle Modo
+            if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
+                await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
+                return
+                
+            await interaction.response.defer()
+            
+            if club_name not in self.clubs:
+                available_clubs = ", ".join(self.clubs.keys())
+                await interaction.followup.send(f"Club '{club_name}' non trouvé. Clubs disponibles: {available_clubs}")
+                return
+            
+            try:
+                # Limiter à 25 lignes pour rester lisible dans un embed
+                nombre = max(1, min(nombre, 25))
+                top_players = await self.store.top_players(club_name, nombre)
+                
+                if not top_players:
+                    await interaction.followup.send(f"Aucun joueur trouvé pour {club_name}.")
+                    return
+                
+                lines = []
+                for rank, player in enumerate(top_players, start=1):
+                    medal = {1: "🥇", 2: "🥈", 3: "🥉"}.get(rank, f"**{rank}.**")
+                    lines.append(f"{medal} {player['pseudo']} : {player['gain_mois']:+,} trophées")
+                
+                embed = discord.Embed(
+                    title=f"🚀 Top {len(top_players)} rusheurs du mois - {club_name}",
+                    description="\n".join(lines),
+                    color=0xffd700
+                )
+                embed.set_footer(text="💡 Les données sont mises à jour toutes les heures")
+                
+                await interaction.followup.send(embed=embed)
+                
+            except Exception as e:
+                logger.error(f"Erreur dans top_rusheurs: {e}")
+                self.set_command_status(interaction, 'error')
+                await interaction.followup.send("Une erreur s'est produite lors de la récupération du classement.")
         
-        @self.bot.tree.command(name="reset_debut_mois", description="Remet à jour les trophées de début de mois pour un club")
+        @self.bot.tree.command(name="reset_debut_mois", description="Remet à jour les trophées de début de mois pour un club (ou « tous »)")
         async def reset_debut_mois(interaction: discord.Interaction, club_name: str):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
             await interaction.response.defer()
             
-            if club_name not in self.clubs:
+            reset_all = club_name.strip().lower() == 'tous'
+            if not reset_all and club_name not in self.clubs:
                 available_clubs = ", ".join(self.clubs.keys())
-                await interaction.followup.send(f"Club '{club_name}' non trouvé. Clubs disponibles: {available_clubs}")
+                await interaction.followup.send(f"Club '{club_name}' non trouvé. Clubs disponibles: {available_clubs} (ou « tous »)")
                 return
             
             try:
-                # Récupérer tous les joueurs du club
-                players_ref = self.db.collection('players')
-                query = players_ref.where('club', '==', club_name)
-                docs = query.stream()
-                
-                updated_count = 0
+                # Mettre à jour trophees_debut_mois avec trophees_actuels pour tous les joueurs du ou des clubs
                 current_time = datetime.now(timezone.utc)
-                
-                for doc in docs:
-                    player_data = doc.to_dict()
-                    
-                    # Mettre à jour trophees_debut_mois avec trophees_actuels
-                    doc.reference.update({
-                        'trophees_debut_mois': player_data['trophees_actuels'],
-                        'updatedAt': current_time
-                    })
-                    updated_count += 1
+                club_names = list(self.clubs) if reset_all else [club_name]
+                updated_counts = await self.reset_month(club_names, current_time)
+                updated_count = sum(updated_counts.values())
+                
+                if reset_all:
+                    description = "Tous les clubs\n" + "\n".join(
+                        f"{name}: **{count}** joueur(s)" for name, count in updated_counts.items()
+                    ) + f"\nTotal: **{updated_count}**"
+                else:
+                    description = f"Club: **{club_name}**\nJoueurs mis à jour: **{updated_count}**"
                 
                 embed = discord.Embed(
                     title="🔄 Réinitialisation terminée",
-                    description=f"Club: **{club_name}**\nJoueurs mis à jour: **{updated_count}**",
+                    description=description,
                     color=0x00ff00
                 )
                 embed.add_field(
@@ -307,8 +1719,69 @@ class BrawlStarsBot:
                 
             except Exception as e:
                 logger.error(f"Erreur dans reset_debut_mois: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la réinitialisation.")
         
+        @self.bot.tree.command(name="historique", description="Affiche la progression des trophées d'un joueur sur les derniers jours")
+        async def historique(interaction: discord.Interaction, player_id: str, jours: int = 7):
+            await interaction.response.defer()
+            
+            try:
+                # Nettoyer l'ID du joueur
+                clean_id = player_id.strip().replace('#', '').upper()
+                if not clean_id.startswith('#'):
+                    clean_id = '#' + clean_id
+                
+                jours = max(1, min(jours, 31))
+                
+                player_doc = (await self.get_players([clean_id])).get(clean_id)
+                if not player_doc:
+                    await interaction.followup.send(f"Joueur {clean_id} non trouvé dans la base de données.")
+                    return
+                
+                points = await self.get_player_history(clean_id, player_doc['club'], jours)
+                if not points:
+                    await interaction.followup.send(f"Aucun historique disponible pour {player_doc['pseudo']} sur les {jours} derniers jours.")
+                    return
+                
+                # Courbe compacte : au plus 48 points, représentés par des blocs
+                blocks = "▁▂▃▄▅▆▇█"
+                step = max(1, len(points) // 48)
+                values = [trophies for _, trophies in points[::step]]
+                low, high = min(values), max(values)
+                curve = "".join(
+                    blocks[(value - low) * (len(blocks) - 1) // (high - low)] if high > low else blocks[0]
+                    for value in values
+                )
+                
+                # Dernière valeur de chaque jour
+                daily = {}
+                for moment, trophies in points:
+                    daily[moment.strftime('%d/%m')] = trophies
+                daily_lines = []
+                previous = None
+                for day, trophies in daily.items():
+                    delta = f" ({trophies - previous:+,})" if previous is not None else ""
+                    daily_lines.append(f"`{day}` {trophies:,}{delta}")
+                    previous = trophies
+                
+                first, last = points[0][1], points[-1][1]
+                embed = discord.Embed(
+                    title=f"📈 Historique de {player_doc['pseudo']}",
+                    description=f"`{curve}`\n{first:,} → {last:,} ({last - first:+,}) sur {jours} jour(s)",
+                    color=0x00ff00
+                )
+                embed.add_field(name="Par jour", value="\n".join(daily_lines[-15:]), inline=False)
+                embed.add_field(name="Club", value=player_doc['club'], inline=True)
+                embed.set_footer(text=f"{len(points)} relevé(s) horaires")
+                
+                await interaction.followup.send(embed=embed)
+                
+            except Exception as e:
+                logger.error(f"Erreur dans historique: {e}")
+                self.set_command_status(interaction, 'error')
+                await interaction.followup.send("Une erreur s'est produite lors de la récupération de l'historique.")
+        
         @self.bot.tree.command(name="debug_roles", description="Affiche tous les rôles du serveur (pour debug)")
         async def debug_roles(interaction: discord.Interaction):
             await interaction.response.defer()
@@ -356,12 +1829,14 @@ class BrawlStarsBot:
                 
             except Exception as e:
                 logger.error(f"Erreur dans debug_roles: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de l'affichage des rôles.")
         
         @self.bot.tree.command(name="places_libres", description="Affiche le nombre de places libres dans chaque club")
         async def places_libres(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -377,12 +1852,12 @@ class BrawlStarsBot:
                 total_places_libres = 0
                 total_members = 0
                 
+                club_snapshots = await self.get_club_snapshots(self.clubs.values())
+                
                 for club_name, club_tag in self.clubs.items():
-                    club_ref = self.db.collection('clubs').document(club_tag)
-                    club_doc = club_ref.get()
+                    club_data = club_snapshots.get(club_tag)
                     
-                    if club_doc.exists:
-                        club_data = club_doc.to_dict()
+                    if club_data:
                         members = club_data.get('member_count', 0)
                         places_libres = 30 - members
                         
@@ -418,18 +1893,20 @@ class BrawlStarsBot:
 
                 
                 # Footer avec dernière mise à jour
-                embed.set_footer(text="💡 Les données sont mises à jour toutes les heures")
+                embed.set_footer(text=f"💡 {self.staleness_note(self.oldest_update(club_snapshots))} • mises à jour toutes les heures")
                 
                 await interaction.followup.send(embed=embed)
                 
             except Exception as e:
                 logger.error(f"Erreur dans places_libres: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la récupération des places libres.")
         
         @self.bot.tree.command(name="presentation", description="Affiche la présentation du réseau Prairie avec les trophées actuels")
         async def presentation(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -448,13 +1925,12 @@ class BrawlStarsBot:
                 
                 # Récupérer les trophées de chaque club
                 clubs_text = []
+                club_snapshots = await self.get_club_snapshots(info['tag'] for info in clubs_info.values())
                 
                 for club_name, info in clubs_info.items():
-                    club_ref = self.db.collection('clubs').document(info['tag'])
-                    club_doc = club_ref.get()
+                    club_data = club_snapshots.get(info['tag'])
                     
-                    if club_doc.exists:
-                        club_data = club_doc.to_dict()
+                    if club_data:
                         total_trophies = club_data.get('total_trophies', 0)
                         
                         # Convertir en millions et arrondir au centième
@@ -487,18 +1963,20 @@ Nous sommes une famille de 6 clubs, laissez-nous vous les présenter :
                 )
                 
                 # Footer avec dernière mise à jour
-                embed.set_footer(text="💡 Trophées mis à jour automatiquement toutes les heures")
+                embed.set_footer(text=f"💡 Trophées mis à jour automatiquement toutes les heures • {self.staleness_note(self.oldest_update(club_snapshots))}")
                 
                 await interaction.followup.send(embed=embed)
                 
             except Exception as e:
                 logger.error(f"Erreur dans presentation: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la génération de la présentation.")
         
         @self.bot.tree.command(name="presentation_courte", description="Affiche la présentation courte du réseau Prairie")
         async def presentation_courte(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -517,13 +1995,12 @@ Nous sommes une famille de 6 clubs, laissez-nous vous les présenter :
                 
                 # Récupérer les trophées de chaque club
                 clubs_list = []
+                club_snapshots = await self.get_club_snapshots(config['tag'] for config in clubs_config.values())
                 
                 for club_name, config in clubs_config.items():
-                    club_ref = self.db.collection('clubs').document(config['tag'])
-                    club_doc = club_ref.get()
+                    club_data = club_snapshots.get(config['tag'])
                     
-                    if club_doc.exists:
-                        club_data = club_doc.to_dict()
+                    if club_data:
                         total_trophies = club_data.get('total_trophies', 0)
                         
                         # Convertir en millions et arrondir au centième
@@ -548,18 +2025,20 @@ Hello à tous ! Nous sommes une famille de 6 clubs Brawl Stars réunis autour de
 
 Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
 
-**💡 Trophées mis à jour automatiquement toutes les heures**"""
+**💡 Trophées mis à jour automatiquement toutes les heures ({self.staleness_note(self.oldest_update(club_snapshots))})**"""
                 
                 await interaction.followup.send(presentation_text)
                 
             except Exception as e:
                 logger.error(f"Erreur dans presentation_courte: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la génération de la présentation courte.")
         
         @self.bot.tree.command(name="set_rusheur_channel", description="Définit le canal pour l'envoi automatique des meilleurs rusheurs")
         async def set_rusheur_channel(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -567,6 +2046,9 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             
             try:
                 self.rusheur_channel_id = interaction.channel.id
+                self.rusheur_message_id = None
+                self.rusheur_standings_hash = None
+                await self.save_rusheur_board()
                 
                 embed = discord.Embed(
                     title="✅ Canal configuré",
@@ -580,12 +2062,14 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
                 
             except Exception as e:
                 logger.error(f"Erreur dans set_rusheur_channel: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de la configuration du canal.")
         
         @self.bot.tree.command(name="stop_rusheur_auto", description="Arrête l'envoi automatique des meilleurs rusheurs")
         async def stop_rusheur_auto(interaction: discord.Interaction):
             # Vérification du rôle Modo
             if not self.has_modo_role(interaction):
+                self.set_command_status(interaction, 'denied')
                 await interaction.response.send_message("❌ Vous n'avez pas les permissions nécessaires pour utiliser cette commande.", ephemeral=True)
                 return
                 
@@ -593,7 +2077,9 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             
             try:
                 self.rusheur_channel_id = None
-                self.last_rusheur_message = None
+                self.rusheur_message_id = None
+                self.rusheur_standings_hash = None
+                await self.store.delete_config('rusheur_board')
                 
                 embed = discord.Embed(
                     title="🛑 Envoi automatique arrêté",
@@ -606,6 +2092,7 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
                 
             except Exception as e:
                 logger.error(f"Erreur dans stop_rusheur_auto: {e}")
+                self.set_command_status(interaction, 'error')
                 await interaction.followup.send("Une erreur s'est produite lors de l'arrêt de l'envoi automatique.")
     
     async def create_session(self):
@@ -623,7 +2110,7 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             'Sec-Fetch-Mode': 'navigate',
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0',
-            'Referer': 'https://brawlace.com/'
+            'Referer': f'{self.brawlace_base_url}/'
         }
         
         # Configuration du connecteur
@@ -643,256 +2130,240 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             timeout=timeout
         )
     
-    async def scrape_club_info(self, club_tag):
-        """Scrape les informations générales d'un club depuis brawlace.com"""
-        try:
-            clean_tag = club_tag.replace('#', '').upper()
-            url = f'https://brawlace.com/clubs/%23{clean_tag}'
+    async def get_http_session(self):
+        """Retourne la session HTTP partagée, en la (re)créant si nécessaire"""
+        if self.http_session is None or self.http_session.closed:
+            self.http_session = await self.create_session()
+        return self.http_session
+    
+    async def close_http_session(self):
+        """Ferme la session HTTP partagée"""
+        if self.http_session is not None and not self.http_session.closed:
+            await self.http_session.close()
+        self.http_session = None
+    
+    def retry_delay(self, attempt, retry_after=None):
+        """Délai avant une nouvelle tentative : Retry-After s'il est fourni, sinon backoff exponentiel avec jitter"""
+        if retry_after is not None:
+            return min(retry_after, self.scrape_backoff_max) + random.uniform(0, self.scrape_backoff_base)
+        return random.uniform(0, min(self.scrape_backoff_max, self.scrape_backoff_base * 2 ** attempt))
+    
+    async def fetch_club_page(self, club_tag, conditional=True, interactive=False):
+        """Télécharge la page brawlace d'un club (une seule requête par club et par cycle)
+        
+        Avec conditional=True, envoie If-None-Match / If-Modified-Since à partir de la
+        dernière page persistée. Les 429, 5xx et timeouts sont réessayés (au plus
+        scrape_max_retries fois) après un backoff exponentiel ou le Retry-After ;
+        avec interactive=True, une seule tentative limitée à interactive_timeout secondes.
+        Retourne un dict {'html', 'not_modified', 'etag', 'last_modified'} ou None en cas d'erreur.
+        """
+        clean_tag = club_tag.replace('#', '').upper()
+        url = f'{self.brawlace_base_url}/clubs/%23{clean_tag}'
+        host = urlparse(url).hostname
+        
+        headers = {}
+        validators = self.page_validators.get(club_tag, {}) if conditional else {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        session = await self.get_http_session()
+        max_retries = 0 if interactive else self.scrape_max_retries
+        timeout = aiohttp.ClientTimeout(total=self.interactive_timeout) if interactive else None
+        
+        for attempt in range(max_retries + 1):
+            # Disjoncteur : pendant une panne de brawlace, échec immédiat sans requête
+            if not self.circuit_breaker.allow():
+                metrics.inc('brawlace_circuit_rejections_total')
+                logger.warning(f"Circuit brawlace ouvert, scraping de {club_tag} ignoré")
+                return None
             
-            session = await self.create_session()
+            # Débit adaptatif vers brawlace (ralentit tout seul en cas de saturation)
+            await self.rate_limiter.acquire(host)
             
             try:
-                # Attendre un peu pour éviter d'être détecté comme bot
-                await asyncio.sleep(2)
-                
-                logger.info(f"Tentative de scraping pour {url}")
-                
-                async with session.get(url, ssl=False, allow_redirects=True) as response:
-                    logger.info(f"Status code: {response.status} pour {url}")
-                    logger.info(f"Content encoding: {response.headers.get('content-encoding', 'none')}")
-                    
-                    if response.status == 200:
-                        html = await response.text()
-                        logger.info(f"HTML récupéré avec succès pour {club_tag}, taille: {len(html)}")
-                    else:
-                        logger.error(f"Erreur HTTP {response.status} pour {url}")
-                        return None
-            finally:
-                await session.close()
+                page = await self.request_club_page(session, url, club_tag, headers, timeout)
+            except (TransientHTTPError, asyncio.TimeoutError, aiohttp.ClientError) as e:
+                retry_after = getattr(e, 'retry_after', None)
+                reason = str(e) if isinstance(e, TransientHTTPError) else type(e).__name__
+                self.rate_limiter.on_throttle(host, retry_after)
+                self.circuit_breaker.record_failure()
+            else:
+                # Toute réponse non transitoire (même un 404) prouve que brawlace répond
+                self.circuit_breaker.record_success()
+                if page is not None:
+                    self.rate_limiter.on_success(host)
+                return page
             
-            logger.info(f"HTML récupéré pour {club_tag}, taille: {len(html)}")
+            if attempt == max_retries:
+                logger.error(f"Abandon du scraping de {club_tag} après {attempt + 1} tentatives ({reason})")
+                return None
             
-            # Debug: sauvegarder un échantillon du HTML
-            if len(html) < 1000:
-                logger.warning(f"HTML très court pour {club_tag}: {html[:500]}")
+            delay = self.retry_delay(attempt, retry_after)
+            metrics.inc('brawlace_retries_total', reason=reason)
+            logger.warning(f"Échec transitoire pour {club_tag} ({reason}), nouvelle tentative dans {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    async def request_club_page(self, session, url, club_tag, headers, timeout=None):
+        """Une requête vers la page d'un club (timeout de la session si timeout est None)
+        
+        Retourne la page (voir fetch_club_page) ou None pour une erreur définitive ;
+        lève TransientHTTPError sur 429 / 5xx.
+        """
+        logger.info(f"Tentative de scraping pour {url}")
+        
+        request_options = {'timeout': timeout} if timeout is not None else {}
+        started = time.perf_counter()
+        try:
+            response = await session.get(url, ssl=False, allow_redirects=True, headers=headers, **request_options)
+        except Exception as e:
+            metrics.observe('brawlace_fetch_seconds', time.perf_counter() - started)
+            metrics.inc('brawlace_requests_total', status=type(e).__name__)
+            raise
+        
+        async with response:
+            logger.info(f"Status code: {response.status} pour {url}")
+            metrics.inc('brawlace_requests_total', status=response.status)
+            logger.info(f"Content encoding: {response.headers.get('content-encoding', 'none')}")
             
-            # Parser les informations du club
-            club_info = {
-                'tag': club_tag,
-                'name': '',
-                'total_trophies': 0,
-                'member_count': 0
+            page = {
+                'html': None,
+                'not_modified': response.status == 304,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
             }
             
-            # Extraire le nom du club
-            name_patterns = [
-                r'<h1[^>]*>([^<]+)</h1>',
-                r'<title>([^<]*?)\s*-\s*Brawl Ace</title>',
-                r'class="club-name[^"]*">([^<]+)<',
-            ]
-            
-            for pattern in name_patterns:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    club_info['name'] = match.group(1).strip()
-                    break
-            
-            # Extraire les trophées totaux - chercher dans les divs/spans de statistiques
-            trophy_patterns = [
-                r'(?:total|club)\s*trophies?[^>]*>[\s\S]*?([0-9,]+)',
-                r'trophies?[^>]*>[\s\S]*?([0-9,]+)',
-                r'<span[^>]*trophies?[^>]*>([0-9,]+)',
-                r'<div[^>]*>[\s\S]*?([0-9,]{4,})',  # Chercher des nombres avec au moins 4 chiffres
-            ]
-            
-            for pattern in trophy_patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        trophies = int(match.replace(',', ''))
-                        if trophies > 1000:  # Les clubs ont généralement plus de 1000 trophées
-                            club_info['total_trophies'] = trophies
-                            break
-                    except ValueError:
-                        continue
-                if club_info['total_trophies'] > 0:
-                    break
-            
-            # Extraire le nombre de membres - compter les lignes de joueurs
-            member_patterns = [
-                r'([0-9]+)\s*/\s*30\s*members?',
-                r'members?\s*[:\s]*([0-9]+)',
-            ]
-            
-            for pattern in member_patterns:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    try:
-                        club_info['member_count'] = int(match.group(1))
-                        break
-                    except ValueError:
-                        continue
+            if page['not_modified']:
+                logger.info(f"Page inchangée (304) pour {club_tag}")
+                metrics.observe('brawlace_fetch_seconds', time.perf_counter() - started)
+                return page
             
-            # Si pas trouvé, compter les lignes de tableau (méthode de fallback)
-            if club_info['member_count'] == 0:
-                tr_matches = re.findall(r'<tr[^>]*>(.*?)</tr>', html, re.DOTALL | re.IGNORECASE)
-                member_count = 0
-                
-                for tr_content in tr_matches:
-                    td_matches = re.findall(r'<td[^>]*>(.*?)</td>', tr_content, re.DOTALL | re.IGNORECASE)
-                    if len(td_matches) >= 4:
-                        # Vérifier si cette ligne contient un joueur
-                        player_cell = td_matches[1] if len(td_matches) > 1 else ""
-                        if 'data-bs-player-tag' in player_cell or '<a' in player_cell:
-                            member_count += 1
-                
-                club_info['member_count'] = member_count
+            if response.status == 429 or response.status >= 500:
+                metrics.observe('brawlace_fetch_seconds', time.perf_counter() - started)
+                raise TransientHTTPError(response.status, parse_retry_after(response.headers.get('Retry-After')))
             
-            logger.info(f"Club info scrapé: {club_info['name']} ({club_info['tag']}) - {club_info['total_trophies']:,} trophées, {club_info['member_count']} membres")
-            return club_info
+            if response.status != 200:
+                logger.error(f"Erreur HTTP {response.status} pour {url}")
+                metrics.observe('brawlace_fetch_seconds', time.perf_counter() - started)
+                return None
             
-        except Exception as e:
-            logger.error(f"Erreur lors du scraping des infos club {club_tag}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
+            body = await response.read()
+            metrics.observe('brawlace_fetch_seconds', time.perf_counter() - started)
+            metrics.inc('brawlace_response_bytes_total', len(body))
+            page['html'] = body.decode(response.get_encoding(), errors='replace')
+        
+        html = page['html']
+        logger.info(f"HTML récupéré pour {club_tag}, taille: {len(html)}")
+        
+        # Debug: sauvegarder un échantillon du HTML
+        if len(html) < 1000:
+            logger.warning(f"HTML très court pour {club_tag}: {html[:500]}")
+        
+        return page
     
-    async def scrape_club_data(self, club_tag):
-        """Scrape les données d'un club depuis brawlace.com"""
+    async def scrape_club_page(self, club_tag, conditional=True, interactive=False):
+        """Télécharge la page d'un club une seule fois et en extrait joueurs et statistiques
+        
+        Retourne un dict {'tag', 'name', 'total_trophies', 'member_count', 'players',
+        'unchanged', 'validators'} ou None si la page n'a pas pu être récupérée.
+        Avec conditional=True, une page identique à la dernière page persistée
+        (304 ou même empreinte) n'est pas parsée : seuls 'tag' et 'unchanged' sont remplis.
+        """
+        started = time.perf_counter()
         try:
-            clean_tag = club_tag.replace('#', '').upper()
-            url = f'https://brawlace.com/clubs/%23{clean_tag}'
-            
-            session = await self.create_session()
-            
-            try:
-                # Attendre un peu pour éviter d'être détecté comme bot
-                await asyncio.sleep(2)
-                
-                logger.info(f"Tentative de scraping pour {url}")
-                
-                async with session.get(url, ssl=False, allow_redirects=True) as response:
-                    logger.info(f"Status code: {response.status} pour {url}")
-                    logger.info(f"Content encoding: {response.headers.get('content-encoding', 'none')}")
-                    
-                    if response.status == 200:
-                        html = await response.text()
-                        logger.info(f"HTML récupéré avec succès pour {club_tag}, taille: {len(html)}")
-                    else:
-                        logger.error(f"Erreur HTTP {response.status} pour {url}")
-                        return []
-            finally:
-                await session.close()
-            
-            logger.info(f"HTML récupéré pour {club_tag}, taille: {len(html)}")
-            
-            # Debug: sauvegarder un échantillon du HTML
-            if len(html) < 1000:
-                logger.warning(f"HTML très court pour {club_tag}: {html[:500]}")
-            
-            # Parser le HTML plus robustement
-            players = []
-            
-            # Rechercher toutes les lignes de tableau
-            tr_matches = re.findall(r'<tr[^>]*>(.*?)</tr>', html, re.DOTALL | re.IGNORECASE)
-            logger.info(f"Trouvé {len(tr_matches)} lignes de tableau")
-            
-            for tr_content in tr_matches:
-                # Extraire toutes les cellules td
-                td_matches = re.findall(r'<td[^>]*>(.*?)</td>', tr_content, re.DOTALL | re.IGNORECASE)
-                
-                if len(td_matches) >= 4:
-                    # Cellule 1 (index 1) contient généralement le pseudo et l'ID
-                    player_cell = td_matches[1] if len(td_matches) > 1 else ""
-                    
-                    # Extraire le pseudo - chercher dans les balises <font> ou <a>
-                    pseudo = ""
-                    pseudo_patterns = [
-                        r'<font[^>]*>([^<]+)</font>',
-                        r'<a[^>]*>([^<]+)</a>',
-                        r'>([^<]+)<'
-                    ]
-                    
-                    for pattern in pseudo_patterns:
-                        match = re.search(pattern, player_cell)
-                        if match and match.group(1).strip():
-                            pseudo = match.group(1).strip()
-                            break
-                    
-                    # Extraire l'ID du joueur
-                    player_id = ""
-                    id_patterns = [
-                        r'data-bs-player-tag=[\'"]([^\'""]*)[\'"]',
-                        r'player-tag=[\'"]([^\'""]*)[\'"]',
-                        r'href="[^"]*player/([^/"]*)"'
-                    ]
-                    
-                    for pattern in id_patterns:
-                        match = re.search(pattern, player_cell)
-                        if match:
-                            player_id = match.group(1).strip()
-                            if not player_id.startswith('#'):
-                                player_id = '#' + player_id
-                            break
-                    
-                    # Cellule des trophées (généralement index 3)
-                    trophy_cell = td_matches[3] if len(td_matches) > 3 else ""
-                    
-                    # Extraire les trophées
-                    trophies = 0
-                    trophy_patterns = [
-                        r'<font[^>]*>([0-9,]+)</font>',
-                        r'>([0-9,]+)<',
-                        r'([0-9,]+)'
-                    ]
-                    
-                    for pattern in trophy_patterns:
-                        match = re.search(pattern, trophy_cell)
-                        if match:
-                            trophies_str = match.group(1).strip().replace(',', '').replace(' ', '')
-                            try:
-                                trophies = int(trophies_str)
-                                break
-                            except ValueError:
-                                continue
-                    
-                    # Validation et ajout du joueur
-                    if pseudo and player_id and trophies > 0:
-                        players.append({
-                            'pseudo': pseudo,
-                            'id': player_id,
-                            'trophies': trophies
-                        })
-                        logger.debug(f"Joueur trouvé: {pseudo} ({player_id}) - {trophies} trophées")
-                    else:
-                        # Debug des cas où on ne trouve pas de données
-                        if not pseudo:
-                            logger.debug(f"Pseudo manquant dans: {player_cell[:100]}")
-                        if not player_id:
-                            logger.debug(f"ID manquant dans: {player_cell[:100]}")
-                        if trophies <= 0:
-                            logger.debug(f"Trophées invalides dans: {trophy_cell[:100]}")
+            page = await self.fetch_club_page(club_tag, conditional=conditional, interactive=interactive)
+            if page is None:
+                return None
             
-            logger.info(f"Scrapé {len(players)} joueurs pour le club {club_tag}")
+            previous = self.page_validators.get(club_tag, {}) if conditional else {}
+            if page['not_modified']:
+                return {'tag': club_tag, 'unchanged': True}
             
-            # Si aucun joueur trouvé, log un échantillon du HTML pour debug
-            if len(players) == 0 and len(html) > 0:
-                logger.warning(f"Aucun joueur trouvé. Échantillon HTML: {html[:1000]}")
+            html = page['html']
+            content_hash = club_page_fingerprint(html)
+            if previous.get('content_hash') == content_hash:
+                logger.info(f"Contenu identique à la dernière page pour {club_tag}, parsing ignoré")
+                return {'tag': club_tag, 'unchanged': True}
             
-            return players
+            parse_started = time.perf_counter()
+            club_page = self.parse_club_info(html, club_tag)
+            club_page['players'] = self.parse_club_players(html, club_tag)
+            metrics.observe('club_parse_seconds', time.perf_counter() - parse_started)
+            metrics.inc('club_players_parsed_total', len(club_page['players']), club=club_tag)
+            club_page['unchanged'] = False
+            club_page['validators'] = {
+                'etag': page['etag'],
+                'last_modified': page['last_modified'],
+                'content_hash': content_hash,
+                'member_ids': [player['id'] for player in club_page['players']]
+            }
+            return club_page
             
         except Exception as e:
-            logger.error(f"Erreur lors du scraping de {club_tag}: {e}")
+            logger.error(f"Erreur lors du scraping de la page club {club_tag}: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return []
+            return None
+        finally:
+            metrics.observe('club_scrape_seconds', time.perf_counter() - started)
+    
+    def parse_club_info(self, html, club_tag):
+        """Extrait le nom, les trophées totaux et le nombre de membres d'une page club"""
+        # Parser les informations du club
+        club_info = {
+            'tag': club_tag,
+            'name': '',
+            'total_trophies': 0,
+            'member_count': 0
+        }
+        
+        # Nom, trophées totaux et membres lus dans le bloc d'en-tête (coût borné)
+        club_info.update(parse_club_stats(html))
+        
+        # Si pas trouvé, compter les lignes de tableau (méthode de fallback)
+        if club_info['member_count'] == 0:
+            club_info['member_count'] = sum(
+                1 for player_cell, _ in iter_member_rows(html)
+                if 'data-bs-player-tag' in player_cell or '<a' in player_cell
+            )
+        
+        logger.info(f"Club info scrapé: {club_info['name']} ({club_info['tag']}) - {club_info['total_trophies']:,} trophées, {club_info['member_count']} membres")
+        return club_info
+    
+    def parse_club_players(self, html, club_tag):
+        """Extrait la liste des joueurs (pseudo, id, trophées) d'une page club"""
+        # Tableau des membres : une seule passe avec des expressions précompilées
+        players = parse_member_table(html)
+        
+        logger.info(f"Scrapé {len(players)} joueurs pour le club {club_tag}")
+        
+        # Si aucun joueur trouvé, log un échantillon du HTML pour debug
+        if len(players) == 0 and len(html) > 0:
+            logger.warning(f"Aucun joueur trouvé. Échantillon HTML: {html[:1000]}")
+        
+        return players
+    
+    async def get_club_snapshots(self, club_tags):
+        """Retourne les documents des clubs demandés (tag -> document ou None)
+        
+        Les clubs absents du cache sont lus en un seul get_all ; le cache est
+        ensuite tenu à jour par update_club_info_in_firebase.
+        """
+        club_tags = list(club_tags)
+        missing_tags = [club_tag for club_tag in club_tags if club_tag not in self.club_snapshots]
+        if missing_tags:
+            fetched = await self.store.get_clubs(missing_tags)
+            for club_tag in missing_tags:
+                self.club_snapshots[club_tag] = fetched.get(club_tag)
+        return {club_tag: self.club_snapshots[club_tag] for club_tag in club_tags}
     
     async def update_club_info_in_firebase(self, club_info, club_name):
         """Met à jour les informations du club dans Firebase"""
         try:
             if not club_info:
                 logger.warning(f"Pas d'informations club à mettre à jour pour {club_name}")
-                return
+                return False
             
             current_time = datetime.now(timezone.utc)
             
@@ -905,110 +2376,449 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
                 'updatedAt': current_time
             }
             
+            # Membres vus lors de ce scraping : sert de "vu pour la dernière fois" pour
+            # tous les joueurs du club, en une seule écriture (les documents joueurs
+            # ne sont réécrits que si leurs données changent)
+            if club_info.get('players'):
+                club_data['member_ids'] = [player['id'] for player in club_info['players']]
+                club_data['membersSeenAt'] = current_time
+            
             # Utiliser le tag comme ID du document
-            club_ref = self.db.collection('clubs').document(club_info['tag'])
+            created = await self.store.upsert_club(club_info['tag'], club_data)
             
-            # Vérifier si le club existe déjà 
-            club_doc = club_ref.get()
-            if club_doc.exists:
-                club_ref.update(club_data)
-                logger.info(f"Club {club_name} mis à jour dans Firebase")
-            else:
-                club_ref.set(club_data)
+            # Garder le cache des clubs aligné sur ce qui vient d'être écrit
+            self.club_snapshots[club_info['tag']] = {**(self.club_snapshots.get(club_info['tag']) or {}), **club_data}
+            
+            if created:
                 logger.info(f"Club {club_name} créé dans Firebase")
+            else:
+                logger.info(f"Club {club_name} mis à jour dans Firebase")
+            return True
                 
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour des infos club {club_name}: {e}")
+            return False
     
-    async def scrape_and_update_club(self, club_tag, club_name):
-        """Scrape et met à jour les données d'un club dans Firebase (joueurs + infos club)"""
-        # Scraper les joueurs
-        players_data = await self.scrape_club_data(club_tag)
-        updated_players = 0
+    def last_good_update(self, club_tag, club_data=None):
+        """Date des dernières données valides d'un club (mémoire, sinon document club), ou None"""
+        if club_tag in self.club_last_success:
+            return self.club_last_success[club_tag]
+        club_data = club_data if club_data is not None else self.club_snapshots.get(club_tag)
+        if club_data:
+            return club_data.get('membersSeenAt') or club_data.get('updatedAt')
+        return None
+    
+    def staleness_note(self, updated_at):
+        """Mention de fraîcheur affichée avec des données servies depuis le stockage"""
+        if updated_at is None:
+            return "Données jamais mises à jour"
+        text = f"Données du {updated_at.strftime('%d/%m/%Y à %H:%M')} UTC"
+        if self.circuit_breaker.state != CircuitBreaker.CLOSED:
+            return f"⚠️ brawlace indisponible : {text}"
+        if datetime.now(timezone.utc) - updated_at > self.stale_after:
+            return f"⚠️ {text} (mise à jour en retard)"
+        return text
+    
+    def oldest_update(self, club_snapshots):
+        """Date des données les plus anciennes parmi des clubs (tag -> document)"""
+        dates = [self.last_good_update(club_tag, club_data) for club_tag, club_data in club_snapshots.items()]
+        dates = [date for date in dates if date is not None]
+        return min(dates) if dates else None
+    
+    def club_lock(self, club_name):
+        """Verrou des écritures d'un club (mises à jour et réinitialisation de début de mois)"""
+        return self.club_locks.setdefault(club_name, asyncio.Lock())
+    
+    async def refresh_club(self, club_tag, club_name, interactive=False):
+        """Scrape et met à jour un club, et retourne un rapport de mise à jour
         
-        for player_data in players_data:
+        Les appels simultanés pour un même club se rattachent à la mise à jour en
+        cours, et un rapport réussi de moins de refresh_fresh_for secondes est
+        réutilisé : dans ces deux cas le rapport porte 'shared': True.
+        Avec interactive=True (commande), la page n'est demandée qu'une fois avec un
+        timeout court, et l'attente d'une mise à jour en cours est limitée à
+        interactive_timeout secondes.
+        Voir perform_club_refresh pour le contenu du rapport.
+        """
+        recent = self.recent_refreshes.get(club_tag)
+        if recent and time.monotonic() - recent[0] < self.refresh_fresh_for:
+            metrics.inc('club_refresh_coalesced_total', reason='fresh')
+            logger.info(f"Mise à jour récente de {club_name} réutilisée")
+            return dict(recent[1], shared=True)
+        
+        task = self.refresh_in_flight.get(club_tag)
+        if task is not None:
+            metrics.inc('club_refresh_coalesced_total', reason='in_flight')
+            logger.info(f"Mise à jour de {club_name} déjà en cours, résultat partagé")
+            # shield : l'annulation d'un appelant n'interrompt pas la mise à jour partagée
+            if not interactive:
+                return dict(await asyncio.shield(task), shared=True)
             try:
-                player_ref = self.db.collection('players').document(player_data['id'])
-                player_doc = player_ref.get()
-                
-                current_time = datetime.now(timezone.utc)
-                
-                if player_doc.exists:
-                    # Mettre à jour le joueur existant - NE PAS TOUCHER trophees_debut_mois
-                    update_data = {
-                        'pseudo': player_data['pseudo'],
-                        'trophees_actuels': player_data['trophies'],
-                        'club': club_name,
-                        'updatedAt': current_time
-                    }
-                    player_ref.update(update_data)
-                    logger.debug(f"Joueur existant mis à jour: {player_data['pseudo']} - trophees_debut_mois préservé")
+                return dict(await asyncio.wait_for(asyncio.shield(task), self.interactive_timeout), shared=True)
+            except asyncio.TimeoutError:
+                return {
+                    'club': club_name, 'tag': club_tag, 'status': 'error', 'updated': 0, 'unchanged': 0,
+                    'error': "Mise à jour déjà en cours (brawlace lent ou indisponible), réessayez plus tard",
+                    'last_success': self.last_good_update(club_tag),
+                    'duration': self.interactive_timeout,
+                    'shared': True
+                }
+        
+        task = asyncio.ensure_future(self.perform_club_refresh(club_tag, club_name, interactive))
+        self.refresh_in_flight[club_tag] = task
+        task.add_done_callback(functools.partial(self.finish_club_refresh, club_tag))
+        return dict(await asyncio.shield(task), shared=False)
+    
+    def finish_club_refresh(self, club_tag, task):
+        """Retire une mise à jour terminée des mises à jour en cours et mémorise son rapport s'il est réussi"""
+        if self.refresh_in_flight.get(club_tag) is task:
+            del self.refresh_in_flight[club_tag]
+        if not task.cancelled() and task.exception() is None and task.result()['status'] != 'error':
+            self.recent_refreshes[club_tag] = (time.monotonic(), task.result())
+    
+    async def perform_club_refresh(self, club_tag, club_name, interactive=False):
+        """Scrape et met à jour un club (sans partage), et retourne un rapport de mise à jour
+        
+        Le rapport contient 'club', 'tag', 'status' ('ok', 'unchanged' si la page
+        est identique à la dernière page persistée, ou 'error'), 'updated',
+        'unchanged', 'error', 'last_success' (date des dernières données valides,
+        éventuellement anciennes en cas d'erreur) et 'duration' (secondes).
+        """
+        started = time.monotonic()
+        result = {'club': club_name, 'tag': club_tag, 'status': 'ok', 'updated': 0, 'unchanged': 0, 'error': None}
+        
+        try:
+            # Une seule requête pour les joueurs et les infos du club
+            club_page = await self.scrape_club_page(club_tag, interactive=interactive)
+            if club_page is None:
+                result['status'] = 'error'
+                retry_at = self.circuit_breaker.retry_at()
+                if retry_at:
+                    result['error'] = f"brawlace indisponible (nouvel essai après {retry_at.strftime('%H:%M')} UTC)"
                 else:
-                    # Créer un nouveau joueur - ici on initialise trophees_debut_mois = trophees_actuels
-                    new_player_data = {
-                        'pseudo': player_data['pseudo'],
-                        'id': player_data['id'],
-                        'trophees_debut_mois': player_data['trophies'],  # Seulement pour les nouveaux joueurs
-                        'trophees_actuels': player_data['trophies'],
-                        'club': club_name,
-                        'updatedAt': current_time
-                    }
-                    player_ref.set(new_player_data)
-                    logger.debug(f"Nouveau joueur créé: {player_data['pseudo']} - trophees_debut_mois initialisé")
-                
-                updated_players += 1
-                
-            except Exception as e:
-                logger.error(f"Erreur lors de la mise à jour du joueur {player_data['id']}: {e}")
+                    result['error'] = "Page du club indisponible"
+            elif club_page['unchanged']:
+                # Page identique : ni parsing ni écriture Firestore
+                result['status'] = 'unchanged'
+                current_time = datetime.now(timezone.utc)
+                self.club_last_success[club_tag] = current_time
+                for player_id in self.page_validators.get(club_tag, {}).get('member_ids', []):
+                    self.player_last_seen[player_id] = current_time
+                logger.info(f"Club {club_name} inchangé depuis la dernière mise à jour")
+            else:
+                # Écritures sérialisées avec les réinitialisations de début de mois du club (reset_month)
+                async with self.club_lock(club_name):
+                    players_data = club_page['players']
+                    persisted = True
+                    
+                    current_time = datetime.now(timezone.utc)
+                    
+                    if players_data:
+                        # Seuls les joueurs nouveaux ou modifiés sont écrits
+                        updated_players, created_players, unchanged_players = await self.store.upsert_players(players_data, club_name, current_time)
+                        persisted = updated_players + unchanged_players == len(players_data)
+                        result['updated'] = updated_players
+                        result['unchanged'] = unchanged_players
+                        logger.debug(f"{created_players} nouveau(x) joueur(s) créé(s) pour {club_name} - trophees_debut_mois initialisé")
+                        self.update_leaderboard(club_name, players_data)
+                        for player_data in players_data:
+                            self.player_cache.pop(player_data['id'])
+                            # "Vu pour la dernière fois", indépendant de updatedAt (dernière modification)
+                            self.player_last_seen[player_data['id']] = current_time
+                    
+                    # Mettre à jour les infos du club (et la liste des membres vus) à partir de la même page
+                    persisted = await self.update_club_info_in_firebase(club_page, club_name) and persisted
+                    
+                    # Relevé horaire compact pour l'historique (un document par club et par jour)
+                    if players_data:
+                        try:
+                            await self.store.append_history(club_tag, club_name, current_time, players_data)
+                        except Exception as e:
+                            logger.error(f"Erreur lors de l'enregistrement de l'historique de {club_name}: {e}")
+                    
+                    # Ne retenir la page comme référence que si tout a bien été écrit
+                    if persisted:
+                        self.page_validators[club_tag] = club_page['validators']
+                        self.club_last_success[club_tag] = current_time
+                    else:
+                        self.page_validators.pop(club_tag, None)
+                    
+                    logger.info(f"Mis à jour {result['updated']} joueurs ({result['unchanged']} inchangés) et infos pour le club {club_name}")
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour de {club_name}: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        
+        result['last_success'] = self.last_good_update(club_tag)
+        result['duration'] = time.monotonic() - started
+        metrics.observe('club_refresh_seconds', result['duration'], status=result['status'])
+        return result
+    
+    async def scrape_and_update_club(self, club_tag, club_name):
+        """Scrape et met à jour les données d'un club dans Firebase (joueurs + infos club)"""
+        result = await self.refresh_club(club_tag, club_name)
+        return result['updated']
+    
+    async def refresh_clubs(self, clubs=None):
+        """Met à jour plusieurs clubs en parallèle (au plus refresh_concurrency à la fois)
         
-        # Scraper et mettre à jour les infos du club
-        club_info = await self.scrape_club_info(club_tag)
-        await self.update_club_info_in_firebase(club_info, club_name)
+        Retourne un dict nom du club -> rapport de refresh_club.
+        """
+        clubs = clubs if clubs is not None else self.clubs
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
         
-        logger.info(f"Mis à jour {updated_players} joueurs et infos pour le club {club_name}")
-        return updated_players
+        async def _refresh(club_name, club_tag):
+            async with semaphore:
+                return await self.refresh_club(club_tag, club_name)
+        
+        results = await asyncio.gather(*(_refresh(name, tag) for name, tag in clubs.items()))
+        return {result['club']: result for result in results}
+    
+    @property
+    def refresh_interval(self):
+        """Intervalle de auto_update en secondes, lu sur la tâche (@tasks.loop) elle-même"""
+        return self.auto_update.hours * 3600 + self.auto_update.minutes * 60 + self.auto_update.seconds
+    
+    def refresh_offsets(self, clubs=None):
+        """Décalage (secondes) de chaque club dans refresh_interval
+        
+        Déterministe : les clubs sont triés par tag et répartis uniformément, donc un
+        club ajouté à self.clubs prend sa place dans la répartition au cycle suivant.
+        """
+        clubs = clubs if clubs is not None else self.clubs
+        ordered = sorted(clubs.items(), key=lambda club: club[1])
+        step = self.refresh_interval / len(ordered) if ordered else 0
+        return {club_name: index * step for index, (club_name, _) in enumerate(ordered)}
+    
+    async def refresh_clubs_staggered(self, clubs=None):
+        """Met à jour les clubs à leur décalage dans l'intervalle plutôt qu'en une seule rafale
+        
+        Chaque rapport est publié dans last_refresh_results dès qu'il est disponible.
+        Retourne un dict nom du club -> rapport de refresh_club.
+        """
+        clubs = clubs if clubs is not None else self.clubs
+        offsets = self.refresh_offsets(clubs)
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+        
+        async def _refresh(club_name, club_tag):
+            await asyncio.sleep(max(0.0, started + offsets[club_name] - time.monotonic()))
+            async with semaphore:
+                result = await self.refresh_club(club_tag, club_name)
+            self.last_refresh_results[club_name] = result
+            return result
+        
+        results = await asyncio.gather(*(_refresh(name, tag) for name, tag in clubs.items()))
+        return {result['club']: result for result in results}
+    
+    async def get_player_history(self, player_id, club_name, days):
+        """Reconstruit la courbe de trophées d'un joueur sur les derniers jours
+        
+        Retourne une liste triée de (datetime, trophées) à partir des documents
+        d'historique quotidiens de son club.
+        """
+        club_tag = self.clubs.get(club_name)
+        if not club_tag:
+            return []
+        
+        today = datetime.now(timezone.utc)
+        history_days = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        history_docs = await self.store.get_history(club_tag, history_days)
+        
+        points = []
+        for history_doc in history_docs:
+            for snapshot in history_doc.get('snapshots', []):
+                try:
+                    index = snapshot['tags'].index(player_id)
+                except ValueError:
+                    continue
+                points.append((snapshot['t'], snapshot['trophies'][index]))
+        points.sort(key=lambda point: point[0])
+        return points
+    
+    async def get_players(self, player_ids):
+        """Retourne les documents de plusieurs joueurs (cache TTL, puis un seul get_all)"""
+        player_docs = {}
+        missing_ids = []
+        for player_id in player_ids:
+            player_doc = self.player_cache.get(player_id)
+            if player_doc is None:
+                missing_ids.append(player_id)
+            else:
+                player_docs[player_id] = player_doc
+        
+        if missing_ids:
+            fetched = await self.store.get_players(missing_ids)
+            for player_id, player_doc in fetched.items():
+                self.player_cache.set(player_id, player_doc)
+            player_docs.update(fetched)
+        
+        return player_docs
+    
+    def update_leaderboard(self, club_name, players_data):
+        """Reconstruit le classement en mémoire d'un club à partir des joueurs scrapés"""
+        board = []
+        for player_data in players_data:
+            debut_mois = (self.store.player_states.get(player_data['id']) or {}).get('trophees_debut_mois')
+            if debut_mois is None:
+                # Joueur non écrit (lot en erreur) : on relira Firestore au prochain accès
+                self.leaderboards.invalidate(club_name)
+                return
+            board.append({
+                'pseudo': player_data['pseudo'],
+                'id': player_data['id'],
+                'trophees_actuels': player_data['trophies'],
+                'trophees_debut_mois': debut_mois,
+                'club': club_name
+            })
+        self.leaderboards.set(club_name, board)
+    
+    async def get_leaderboard(self, club_name):
+        """Retourne le classement mensuel d'un club (cache, sinon lecture Firestore)
+        
+        Comme le classement alimenté par update_leaderboard, il ne contient que les
+        membres vus au dernier scraping (member_ids du document club) : les anciens
+        membres dont le document indique encore ce club sont écartés.
+        """
+        board = self.leaderboards.get(club_name)
+        if board is None:
+            players = await self.store.get_club_players(club_name)
+            club_tag = self.clubs.get(club_name)
+            club_data = (await self.get_club_snapshots([club_tag]))[club_tag] if club_tag else None
+            if club_data and club_data.get('member_ids') is not None:
+                member_ids = set(club_data['member_ids'])
+                players = [player for player in players if player.get('id') in member_ids]
+            self.leaderboards.set(club_name, players)
+            board = self.leaderboards.get(club_name)
+        return board
     
     async def get_best_rusher(self, club_name):
         """Trouve le meilleur rusheur d'un club"""
         try:
-            players_ref = self.db.collection('players')
-            query = players_ref.where('club', '==', club_name)
-            docs = query.stream()
-            
-            best_player = None
-            best_diff = -float('inf')
-            
-            for doc in docs:
-                player_data = doc.to_dict()
-                diff = player_data['trophees_actuels'] - player_data['trophees_debut_mois']
-                
-                if diff > best_diff:
-                    best_diff = diff
-                    best_player = player_data
-            
-            return best_player
+            board = await self.get_leaderboard(club_name)
+            return board[0] if board else None
             
         except Exception as e:
             logger.error(f"Erreur lors de la recherche du meilleur rusheur pour {club_name}: {e}")
             return None
     
     @tasks.loop(hours=1)  # Changé à 1 heure
+    @instrument_task('auto_update')
     async def auto_update(self):
         """Met à jour automatiquement tous les clubs toutes les heures"""
-        logger.info("Début de la mise à jour automatique (toutes les heures)")
+        started = time.monotonic()
+        if self.refresh_schedule == 'staggered':
+            logger.info(f"Début de la mise à jour automatique échelonnée ({len(self.clubs)} clubs répartis sur {self.refresh_interval:.0f}s)")
+            results = await self.refresh_clubs_staggered()
+        else:
+            logger.info("Début de la mise à jour automatique (toutes les heures)")
+            results = await self.refresh_clubs()
+        self.last_refresh_at = datetime.now(timezone.utc)
+        self.last_refresh_results = results
         
-        for club_name, club_tag in self.clubs.items():
-            try:
-                await self.scrape_and_update_club(club_tag, club_name)
-                await asyncio.sleep(5)  # Pause de 5 secondes entre chaque club
-            except Exception as e:
-                logger.error(f"Erreur lors de la mise à jour automatique de {club_name}: {e}")
+        for club_name, result in results.items():
+            if result['status'] == 'error':
+                logger.error(f"Erreur lors de la mise à jour automatique de {club_name}: {result['error']}")
+        
+        failed = sum(1 for result in results.values() if result['status'] == 'error')
+        unchanged = [club_name for club_name, result in results.items() if result['status'] == 'unchanged']
+        logger.info(f"Mise à jour automatique terminée en {time.monotonic() - started:.1f}s ({len(results) - failed}/{len(results)} clubs à jour, {len(unchanged)} inchangé(s))")
+        if unchanged:
+            logger.info(f"Clubs inchangés: {', '.join(unchanged)}")
+    
+    async def reset_month(self, club_names, current_time):
+        """Réinitialise les trophées de début de mois des clubs donnés (lots d'écritures)
         
-        logger.info("Mise à jour automatique terminée")
+        Les verrous des clubs sont pris pendant la réinitialisation : aucune mise à
+        jour de ces clubs ne peut réécrire un gain calculé avant le reset.
+        Une réinitialisation de tous les clubs est enregistrée dans la configuration
+        monthly_reset, ce qui rend la réinitialisation automatique du mois idempotente.
+        Retourne le nombre de joueurs réinitialisés par club.
+        """
+        async with self.monthly_reset_lock, contextlib.AsyncExitStack() as club_locks:
+            # Toujours dans le même ordre ; une mise à jour ne prend qu'un verrou de club
+            for club_name in sorted(club_names):
+                await club_locks.enter_async_context(self.club_lock(club_name))
+            
+            updated_counts = await self.store.reset_debut_mois(club_names, current_time)
+            for club_name in club_names:
+                self.leaderboards.invalidate(club_name)
+                # La prochaine mise à jour repart d'une page complète, sans rapport récent réutilisé
+                club_tag = self.clubs.get(club_name)
+                self.page_validators.pop(club_tag, None)
+                self.recent_refreshes.pop(club_tag, None)
+            self.player_cache.clear()
+            
+            if set(club_names) >= set(self.clubs):
+                await self.store.set_config('monthly_reset', {
+                    'month': current_time.strftime('%Y-%m'),
+                    'resetAt': current_time,
+                    'players': sum(updated_counts.values())
+                })
+            return updated_counts
+    
+    async def run_monthly_reset_if_due(self):
+        """Réinitialise tous les clubs si l'on est le 1er du mois et que ce mois n'a pas encore été traité"""
+        current_time = datetime.now(timezone.utc)
+        if current_time.day != 1:
+            return
+        
+        month = current_time.strftime('%Y-%m')
+        last_reset = await self.store.get_config('monthly_reset')
+        if last_reset and last_reset.get('month') == month:
+            logger.info(f"Réinitialisation mensuelle de {month} déjà effectuée, rien à faire")
+            return
+        
+        updated_counts = await self.reset_month(list(self.clubs), current_time)
+        logger.info(f"Réinitialisation mensuelle de {month} effectuée: {sum(updated_counts.values())} joueurs sur {len(updated_counts)} clubs")
+    
+    @tasks.loop(time=MONTHLY_RESET_TIME)
+    @instrument_task('auto_monthly_reset')
+    async def auto_monthly_reset(self):
+        """Réinitialise automatiquement les trophées de début de mois le 1er à 00:00 UTC"""
+        try:
+            await self.run_monthly_reset_if_due()
+        except Exception as e:
+            # Pas de raise : une exception arrêterait la tâche ; le rattrapage se fera au redémarrage
+            logger.error(f"Erreur lors de la réinitialisation mensuelle automatique: {e}")
+    
+    async def load_rusheur_board(self):
+        """Recharge la configuration du tableau des rusheurs depuis Firestore"""
+        try:
+            board = await self.store.get_config('rusheur_board')
+            if board:
+                self.rusheur_channel_id = board.get('channel_id')
+                self.rusheur_message_id = board.get('message_id')
+                self.rusheur_standings_hash = board.get('standings_hash')
+                logger.info(f"Tableau des rusheurs rechargé (canal {self.rusheur_channel_id}, message {self.rusheur_message_id})")
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du tableau des rusheurs: {e}")
+    
+    async def save_rusheur_board(self):
+        """Persiste la configuration du tableau des rusheurs dans Firestore"""
+        await self.store.set_config('rusheur_board', {
+            'channel_id': self.rusheur_channel_id,
+            'message_id': self.rusheur_message_id,
+            'standings_hash': self.rusheur_standings_hash
+        })
+    
+    async def reset_rusheur_board(self):
+        """Désactive le tableau des rusheurs (canal introuvable ou inaccessible)"""
+        self.rusheur_channel_id = None
+        self.rusheur_message_id = None
+        self.rusheur_standings_hash = None
+        try:
+            await self.store.delete_config('rusheur_board')
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression du tableau des rusheurs: {e}")
     
     @tasks.loop(minutes=30)  # Toutes les 30 minutes
+    @instrument_task('auto_rusheur_update')
     async def auto_rusheur_update(self):
-        """Envoie automatiquement les meilleurs rusheurs toutes les demi-heures"""
+        """Met à jour le tableau des meilleurs rusheurs toutes les demi-heures
+        
+        Le message est édité sur place, et seulement si le classement a changé.
+        """
         if not self.rusheur_channel_id:
             logger.info("Pas de canal rusheur configuré, skip")
             return  # Pas de canal configuré
@@ -1017,82 +2827,93 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             channel = self.bot.get_channel(self.rusheur_channel_id)
             if not channel:
                 logger.error(f"Canal rusheur non trouvé: {self.rusheur_channel_id}")
-                self.rusheur_channel_id = None  # Reset si le canal n'existe plus
+                await self.reset_rusheur_board()  # Reset si le canal n'existe plus
                 return
             
-            logger.info(f"Début de l'envoi automatique des meilleurs rusheurs dans {channel.name}")
-            
-            # Supprimer le message précédent s'il existe
-            if self.last_rusheur_message:
+            # Classement actuel de chaque club
+            standings = []
+            for club_name in self.clubs.keys():
                 try:
-                    await self.last_rusheur_message.delete()
-                    logger.info("Ancien message des rusheurs supprimé")
-                except discord.NotFound:
-                    logger.info("Ancien message des rusheurs déjà supprimé")
-                except discord.Forbidden:
-                    logger.error("Permissions insuffisantes pour supprimer l'ancien message")
+                    best_player = await self.get_best_rusher(club_name)
+                    if best_player:
+                        diff = best_player['trophees_actuels'] - best_player['trophees_debut_mois']
+                        standings.append((club_name, best_player['pseudo'], diff))
+                    else:
+                        standings.append((club_name, None, None))
+                        logger.warning(f"Aucun rusheur trouvé pour {club_name}")
                 except Exception as e:
-                    logger.error(f"Erreur lors de la suppression de l'ancien message: {e}")
-                finally:
-                    self.last_rusheur_message = None
+                    logger.error(f"Erreur lors de la récupération du rusheur pour {club_name}: {e}")
+                    standings.append((club_name, None, 'erreur'))
+            
+            standings_hash = hashlib.sha256(json.dumps(standings, ensure_ascii=False).encode('utf-8')).hexdigest()
+            if standings_hash == self.rusheur_standings_hash and self.rusheur_message_id:
+                logger.info("Classement des rusheurs inchangé, message conservé")
+                return
+            
+            logger.info(f"Mise à jour du tableau des meilleurs rusheurs dans {channel.name}")
             
             # Créer l'embed des meilleurs rusheurs
             embed = discord.Embed(
                 title="🚀 Meilleurs rusheurs du mois",
-                description="Mise à jour automatique toutes les 30 minutes",
+                description="Vérifié automatiquement toutes les 30 minutes",
                 color=0xffd700
             )
             
-            rusheurs_found = False
             total_rusheurs = 0
             
-            for club_name in self.clubs.keys():
-                try:
-                    best_player = await self.get_best_rusher(club_name)
-                    if best_player:
-                        diff = best_player['trophees_actuels'] - best_player['trophees_debut_mois']
-                        if diff >= 0:  # Ne afficher que les gains positifs ou nuls
-                            embed.add_field(
-                                name=f"🏆 {club_name}",
-                                value=f"**{best_player['pseudo']}**\n+{diff:,} trophées",
-                                inline=True
-                            )
-                            rusheurs_found = True
-                            total_rusheurs += 1
-                            logger.info(f"Rusheur trouvé pour {club_name}: {best_player['pseudo']} (+{diff})")
-                        else:
-                            embed.add_field(
-                                name=f"📉 {club_name}",
-                                value=f"**{best_player['pseudo']}**\n{diff:,} trophées",
-                                inline=True
-                            )
-                            total_rusheurs += 1
-                    else:
-                        embed.add_field(
-                            name=f"❌ {club_name}",
-                            value="Aucun joueur trouvé",
-                            inline=True
-                        )
-                        logger.warning(f"Aucun rusheur trouvé pour {club_name}")
-                except Exception as e:
-                    logger.error(f"Erreur lors de la récupération du rusheur pour {club_name}: {e}")
+            for club_name, pseudo, diff in standings:
+                if diff == 'erreur':
                     embed.add_field(
                         name=f"⚠️ {club_name}",
                         value="Erreur de récupération",
                         inline=True
                     )
+                elif pseudo is None:
+                    embed.add_field(
+                        name=f"❌ {club_name}",
+                        value="Aucun joueur trouvé",
+                        inline=True
+                    )
+                elif diff >= 0:  # Ne afficher que les gains positifs ou nuls
+                    embed.add_field(
+                        name=f"🏆 {club_name}",
+                        value=f"**{pseudo}**\n+{diff:,} trophées",
+                        inline=True
+                    )
+                    total_rusheurs += 1
+                    logger.info(f"Rusheur trouvé pour {club_name}: {pseudo} (+{diff})")
+                else:
+                    embed.add_field(
+                        name=f"📉 {club_name}",
+                        value=f"**{pseudo}**\n{diff:,} trophées",
+                        inline=True
+                    )
+                    total_rusheurs += 1
             
             # Ajouter un footer avec l'heure de mise à jour
             now = datetime.now(timezone.utc)
             embed.set_footer(text=f"🕑 Mis à jour automatiquement le {now.strftime('%d/%m/%Y à %H:%M')} UTC • {total_rusheurs} club(s) traité(s)")
             
-            # Envoyer le nouveau message
             try:
-                self.last_rusheur_message = await channel.send(embed=embed)
-                logger.info(f"Message des meilleurs rusheurs envoyé avec succès dans {channel.name} (ID: {self.last_rusheur_message.id})")
+                if self.rusheur_message_id:
+                    # Édition sur place : un seul appel à l'API Discord
+                    try:
+                        await channel.get_partial_message(self.rusheur_message_id).edit(embed=embed)
+                        logger.info(f"Tableau des rusheurs édité dans {channel.name} (ID: {self.rusheur_message_id})")
+                    except discord.NotFound:
+                        logger.info("Ancien message des rusheurs supprimé, envoi d'un nouveau message")
+                        self.rusheur_message_id = None
+                
+                if not self.rusheur_message_id:
+                    message = await channel.send(embed=embed)
+                    self.rusheur_message_id = message.id
+                    logger.info(f"Message des meilleurs rusheurs envoyé avec succès dans {channel.name} (ID: {message.id})")
+                
+                self.rusheur_standings_hash = standings_hash
+                await self.save_rusheur_board()
             except discord.Forbidden:
                 logger.error(f"Permissions insuffisantes pour envoyer un message dans {channel.name}")
-                self.rusheur_channel_id = None  # Reset le canal si pas de permissions
+                await self.reset_rusheur_board()  # Reset le canal si pas de permissions
             except discord.HTTPException as e:
                 logger.error(f"Erreur HTTP lors de l'envoi du message: {e}")
             except Exception as e:
@@ -1103,34 +2924,53 @@ Rejoins-nous et pousse dans la joie ! MP si tu veux intégrer l'un de nos clubs.
             import traceback
             logger.error(f"Traceback complet: {traceback.format_exc()}")
     
+    @auto_update.before_loop
+    async def before_auto_update(self):
+        """Attend que le bot soit prêt avant la première mise à jour automatique"""
+        await self.bot.wait_until_ready()
+    
+    @auto_monthly_reset.before_loop
+    async def before_auto_monthly_reset(self):
+        """Rattrape la réinitialisation du jour si le bot a démarré après 00:00 UTC le 1er"""
+        await self.bot.wait_until_ready()
+        try:
+            await self.run_monthly_reset_if_due()
+        except Exception as e:
+            logger.error(f"Erreur lors du rattrapage de la réinitialisation mensuelle: {e}")
+    
     @auto_rusheur_update.before_loop
     async def before_auto_rusheur_update(self):
         """Attend que le bot soit prêt avant de démarrer l'envoi automatique"""
         await self.bot.wait_until_ready()
+        # Recharger le canal et le message configurés avant le redémarrage
+        await self.load_rusheur_board()
         logger.info("Bot prêt, l'envoi automatique des rusheurs peut démarrer dans 30 minutes")
         # Optionnel: attendre encore un peu pour être sûr que tout est initialisé
         await asyncio.sleep(10)
     
-    def run_flask(self):
-        """Lance le serveur Flask"""
-        self.app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
-    
     async def run_bot(self):
         """Lance le bot Discord"""
         token = os.environ.get('DISCORD_TOKEN')
         if not token:
             raise ValueError("DISCORD_TOKEN non trouvé dans les variables d'environnement")
         
-        await self.bot.start(token)
+        # Session HTTP partagée : pool de connexions et cache DNS réutilisés entre scrapings
+        self.http_session = await self.create_session()
+        
+        try:
+            await self.start_web_server()
+            await self.bot.start(token)
+        finally:
+            await self.stop_web_server()
+            await self.close_http_session()
     
     def run(self):
-        """Lance le bot et le serveur Flask"""
-        # Lancer Flask dans un thread séparé
-        flask_thread = threading.Thread(target=self.run_flask, daemon=True)
-        flask_thread.start()
-        
-        # Lancer le bot Discord
-        asyncio.run(self.run_bot())
+        """Lance le bot et le serveur HTTP"""
+        # Lancer le bot Discord (le serveur HTTP tourne sur la même boucle)
+        try:
+            asyncio.run(self.run_bot())
+        finally:
+            self.store.close()
 
 if __name__ == "__main__":
     bot = BrawlStarsBot()